@@ -1,20 +1,41 @@
+import asyncio
+import copy
+import io
+import json
 import os
-from datetime import date
-from typing import Annotated
+from contextlib import asynccontextmanager, nullcontext
+from datetime import date, timedelta
+from typing import Annotated, Literal
 import pendulum
-from async_lru import alru_cache
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from icecream import ic
-from fastapi import FastAPI, HTTPException, Form, UploadFile, File
+from fastapi import FastAPI, HTTPException, Form, UploadFile, File, Query
 from urllib.parse import urlparse, urlencode
-from starlette.responses import RedirectResponse, JSONResponse
+from starlette.background import BackgroundTask
+from starlette.responses import RedirectResponse, JSONResponse, StreamingResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from pydantic import BaseModel
-from core.runner import scrape_price_url, scrape_reviews_url, scrape_properties_url, scrape_availability_url
+from core import settings, tracing
+from core.admission import admission, AdmissionRejected
+from core.Availability import AvailabilityCalendar
+from core.browser_pool import browser_pool
+from core.cache import response_cache
+from core.review_store import review_store
+from core.revalidation import revalidating_cache
+from core.singleflight import single_flight
+from core.warming import cache_warmer
+from core.xmlstream import stream_records, read_chunks
+from core.executor import extractors
+from core.http_client import http_client
+from core.metrics import render_metrics
+from core.parsing import parsing_stats
+from core.runner import scrape_price_url, scrape_reviews_url, scrape_properties_url, scrape_availability_url, \
+    defer_rental_details, price_tier_stats, quote_registry, PriceSession, booking_request_url
 from middlewares.exceptionhandler import ExceptionHandlerMiddleware
+from middlewares.metrics import MetricsMiddleware
+from middlewares.tracing import TracingMiddleware
 from quick_xmltodict import parse
 
-ic.configureOutput(prefix='|> ')
-
 tags_metadata = [
     {"name": "Headless", "description": "For headless operations"},
 ]
@@ -25,6 +46,45 @@ class RequestTarget(BaseModel):
     watermark: str
 
 
+class ReviewsTarget(RequestTarget):
+    since: date | None = None
+
+
+class PropertiesTarget(RequestTarget):
+    rental_details: Literal["inline", "deferred", "none"] = "inline"
+
+
+class PriceItem(BaseModel):
+    property_id: str
+    arrival: date
+    departure: date
+    adults: int = 1
+    children: int = 0
+
+
+class PriceBatch(BaseModel):
+    items: list[PriceItem]
+    watermark: str
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    extractors.start()
+    await http_client.start()
+    await browser_pool.start()
+    cache_warmer.start({
+        "availability": lambda options: availability_request(str(options["property_id"])),
+        "price": warm_price_request,
+        "reviews": lambda options: reviews_request(fill_in_target_url(
+            RequestTarget(target_url=options["target_url"], watermark=""), "reviews")),
+    }, lambda endpoint, params, produce: refresh_cached_response(endpoint, params, produce, background=True))
+    yield
+    await cache_warmer.stop()
+    await browser_pool.stop()
+    await http_client.stop()
+    extractors.stop()
+
+
 app = FastAPI(title="Headless Horseman",
               description="A drowsy, dreamy influence seems to hang over the land, and to pervade the very atmosphere",
               version="0.0.1",
@@ -34,6 +94,7 @@ app = FastAPI(title="Headless Horseman",
                   "email": "siliconrob@siliconheaven.net",
               },
               openapi_tags=tags_metadata,
+              lifespan=lifespan,
               license_info={
                   "name": "MIT License",
                   "url": "https://opensource.org/license/mit/",
@@ -50,6 +111,8 @@ app.add_middleware(
 )
 
 app.add_middleware(ExceptionHandlerMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 def is_valid_url(url):
@@ -60,9 +123,55 @@ def is_valid_url(url):
         return False
 
 
+revalidations: dict[str, asyncio.Task] = {}
+
+
+async def cached_response(endpoint: str, params: dict, produce, cacheable: bool = True) -> dict:
+    key = response_cache.key(endpoint, params)
+    cache_warmer.record(key)
+    cached = response_cache.lookup(endpoint, params) if cacheable else None
+    if cached is not None:
+        response, stale = cached
+        if stale and key not in revalidations:
+            revalidations[key] = asyncio.create_task(revalidate_response(endpoint, params, produce))
+            revalidations[key].add_done_callback(lambda _: revalidations.pop(key, None))
+        return response
+    return await refresh_cached_response(endpoint, params, produce, cacheable)
+
+
+@asynccontextmanager
+async def admitted(endpoint: str, background: bool = False):
+    try:
+        async with admission.admit(endpoint, background):
+            yield
+    except AdmissionRejected as error:
+        raise HTTPException(error.status_code, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+async def refresh_cached_response(endpoint: str, params: dict, produce, cacheable: bool = True,
+                                  background: bool = False) -> dict:
+    async def produce_encoded():
+        async with admitted(endpoint, background):
+            return jsonable_encoder(await produce())
+
+    response = await single_flight.run(response_cache.key(endpoint, params), produce_encoded)
+    if cacheable and response.get("result") is not None:
+        response_cache.set(endpoint, params, response)
+    return response
+
+
+async def revalidate_response(endpoint: str, params: dict, produce):
+    try:
+        await refresh_cached_response(endpoint, params, produce, background=True)
+    except HTTPException as error:
+        tracing.warning("revalidate_response", endpoint=endpoint, status=error.status_code)
+    except Exception as error:
+        tracing.error("revalidate_response", error, endpoint=endpoint)
+
+
 @app.post("/convert", tags=["Headless"], include_in_schema=True)
 async def convert(input_data: Annotated[str, Form()]):
-    ic(input_data)
+    tracing.debug("convert", size=len(input_data))
     parsed_xml_dict = parse(input_data)
     return dict(result=parsed_xml_dict)
 
@@ -72,18 +181,77 @@ async def convert_file(upload_file: Annotated[UploadFile, File()]):
     if upload_file.content_type not in ["text/xml"]:
         raise HTTPException(400,
                             detail=f"File {upload_file.filename} must be an XML file not [{upload_file.content_type}]")
-    contents = str(upload_file.file.read())
-    ic(contents)
+    contents = (await upload_file.read()).decode()
     parsed_xml_dict = parse(contents)
     return dict(result=parsed_xml_dict)
 
 
-@alru_cache(ttl=60)
+@app.post("/convert_stream", tags=["Headless"], include_in_schema=True)
+async def convert_stream(upload_file: Annotated[UploadFile, File()],
+                         record_element: Annotated[str, "Element streamed back as NDJSON lines"]):
+    if upload_file.content_type not in ["text/xml", "application/xml"]:
+        raise HTTPException(400,
+                            detail=f"File {upload_file.filename} must be an XML file not [{upload_file.content_type}]")
+    detached_file = detach_upload(upload_file)
+    return StreamingResponse(stream_records(read_chunks(detached_file), record_element),
+                             media_type="application/x-ndjson", background=BackgroundTask(detached_file.close))
+
+
+def detach_upload(upload_file: UploadFile) -> UploadFile:
+    # FastAPI closes form files as soon as the endpoint returns, before a StreamingResponse has read them
+    detached_file = UploadFile(upload_file.file, size=upload_file.size, filename=upload_file.filename,
+                               headers=upload_file.headers)
+    upload_file.file = io.BytesIO()
+    return detached_file
+
+
 @app.get("/get_availability/{property_id}", tags=["Headless"], include_in_schema=True)
-async def get_price(property_id: Annotated[str, "Property ID"], watermark: Annotated[str, "Watermark"] = ""):
+async def get_availability(property_id: Annotated[str, "Property ID"],
+                           view: Annotated[Literal["dates", "ranges"], "Available dates or free ranges"] = "dates",
+                           horizon_days: Annotated[int, "Days ahead"] = settings.availability_horizon_days,
+                           arrival: Annotated[date | None, "Arrival to check"] = None,
+                           departure: Annotated[date | None, "Departure to check"] = None,
+                           nights: Annotated[int | None, "Open window length"] = None,
+                           count: Annotated[int, "Open windows to return"] = 10,
+                           watermark: Annotated[str, "Watermark"] = ""):
     if os.getenv('API_REQUEST') != watermark:
         raise HTTPException(401)
+    if horizon_days < 1:
+        raise HTTPException(400, detail=f'Horizon {horizon_days} is less than minimum value of 1')
+    if horizon_days > settings.availability_max_horizon_days:
+        raise HTTPException(400, detail=f'Horizon {horizon_days} is more than the maximum of {settings.availability_max_horizon_days}')
+    if (arrival is None) != (departure is None):
+        raise HTTPException(400, detail='Arrival and Departure must be provided together')
+    if arrival is not None and arrival >= departure:
+        raise HTTPException(400, detail=f'Arrival {arrival} is greater than Departure {departure}')
+    if nights is not None and nights < 1:
+        raise HTTPException(400, detail=f'Nights {nights} is less than minimum value of 1')
+    if count < 1:
+        raise HTTPException(400, detail=f'Count {count} is less than minimum value of 1')
 
+    response = await cached_response(*availability_request(property_id))
+    if response["result"] is None:
+        return response
+
+    calendars = [AvailabilityCalendar.from_dict(z) for z in response["result"]]
+    start_date = pendulum.now('UTC').date()
+    end_date = start_date + timedelta(days=horizon_days + 1)
+    if view == "ranges":
+        result = [[{"start": z[0], "end": z[1]} for z in calendar.free_windows(start_date, end_date)]
+                  for calendar in calendars]
+    else:
+        result = [calendar.available_dates(start_date, end_date) for calendar in calendars]
+    availability = dict(result=result)
+    if arrival is not None:
+        availability["open"] = [calendar.is_open(arrival, departure) for calendar in calendars]
+    if nights is not None:
+        availability["windows"] = [[{"start": z[0], "end": z[1]}
+                                    for z in calendar.open_windows(start_date, end_date, nights, count)]
+                                   for calendar in calendars]
+    return availability
+
+
+def availability_request(property_id: str) -> tuple:
     url_request_params = {
         'property': property_id,
         'arrival': pendulum.now().date().isoformat(),
@@ -91,12 +259,16 @@ async def get_price(property_id: Annotated[str, "Property ID"], watermark: Annot
         'adults': 2,
         'children': 0
     }
-    target_url = ic(f'https://booking.ownerrez.com/request?{urlencode(url_request_params)}')
-    response = ic(await scrape_availability_url(target_url))
-    return dict(result=response)
+    target_url = f'{booking_request_url}?{urlencode(url_request_params)}'
+    tracing.debug("target_url", target_url=target_url)
+
+    async def produce():
+        response = await scrape_availability_url(target_url)
+        return dict(result=None if response is None else [z.to_dict() for z in response])
+
+    return "get_availability", {"property_id": property_id}, produce
 
 
-@alru_cache(ttl=60)
 @app.get("/get_price/{property_id}", tags=["Headless"], include_in_schema=True)
 async def get_price(property_id: Annotated[str, "Property ID"],
                     arrival: Annotated[date, "Arrival"] = pendulum.now().add(months=1).to_date_string(),
@@ -106,11 +278,18 @@ async def get_price(property_id: Annotated[str, "Property ID"],
                     watermark: Annotated[str, "Watermark"] = ""):
     if os.getenv('API_REQUEST') != watermark:
         raise HTTPException(401)
+    return await quote_price(property_id, arrival, departure, adults, children)
+
+
+async def quote_price(property_id: str, arrival: date, departure: date, adults: int, children: int) -> dict:
     if arrival >= departure:
         raise HTTPException(400, detail=f'Arrival {arrival} is greater than Departure {departure}')
     if adults < 1:
         raise HTTPException(400, detail=f'Adults {adults} is less than minimum value of 1')
+    return await cached_response(*price_request(property_id, arrival, departure, adults, children))
+
 
+def price_request(property_id: str, arrival: date, departure: date, adults: int, children: int) -> tuple:
     url_request_params = {
         'property': property_id,
         'arrival': arrival.isoformat(),
@@ -118,9 +297,136 @@ async def get_price(property_id: Annotated[str, "Property ID"],
         'adults': adults,
         'children': children
     }
-    target_url = ic(f'https://booking.ownerrez.com/request?{urlencode(url_request_params)}')
-    response = ic(await scrape_price_url(target_url))
-    return dict(result=response)
+    target_url = f'{booking_request_url}?{urlencode(url_request_params)}'
+    tracing.debug("target_url", target_url=target_url)
+
+    async def produce():
+        response, tier = await scrape_price_url(target_url)
+        return dict(result=response, tier=tier)
+
+    return "get_price", url_request_params, produce
+
+
+def warm_price_request(options: dict) -> tuple:
+    if "arrival" in options:
+        arrival = date.fromisoformat(options["arrival"])
+    else:
+        arrival = pendulum.now().add(days=int(options.get("days_ahead", 30))).date()
+    if "departure" in options:
+        departure = date.fromisoformat(options["departure"])
+    else:
+        departure = arrival + timedelta(days=int(options.get("nights", 7)))
+    return price_request(str(options["property_id"]), arrival, departure, int(options.get("adults", 1)),
+                         int(options.get("children", 0)))
+
+
+@app.get("/get_price_matrix/{property_id}", tags=["Headless"], include_in_schema=True)
+async def get_price_matrix(property_id: Annotated[str, "Property ID"],
+                           start: Annotated[date, "First arrival"] = pendulum.now().add(months=1).to_date_string(),
+                           end: Annotated[date, "Last arrival"] = pendulum.now().add(months=1, days=6).to_date_string(),
+                           stay_lengths: Annotated[list[int], Query(description="Nights per stay")] = [7],
+                           adults: Annotated[int, "Adults"] = 1,
+                           children: Annotated[int, "Children"] = 0,
+                           watermark: Annotated[str, "Watermark"] = ""):
+    if os.getenv('API_REQUEST') != watermark:
+        raise HTTPException(401)
+    if start > end:
+        raise HTTPException(400, detail=f'Start {start} is greater than End {end}')
+    if adults < 1:
+        raise HTTPException(400, detail=f'Adults {adults} is less than minimum value of 1')
+    stay_lengths = sorted(set(stay_lengths))
+    if len(stay_lengths) == 0 or stay_lengths[0] < 1:
+        raise HTTPException(400, detail='Stay lengths must be at least 1 night')
+    arrivals = [start + timedelta(days=z) for z in range((end - start).days + 1)]
+    if len(arrivals) * len(stay_lengths) > settings.price_matrix_max_cells:
+        raise HTTPException(400, detail=f'{len(arrivals) * len(stay_lengths)} cells is more than the maximum of {settings.price_matrix_max_cells}')
+
+    cell_params = {(arrival, nights): {
+        'property': property_id,
+        'arrival': arrival.isoformat(),
+        'departure': (arrival + timedelta(days=nights)).isoformat(),
+        'adults': adults,
+        'children': children
+    } for arrival in arrivals for nights in stay_lengths}
+    cells = {cell: response_cache.get("price_cell", params) for cell, params in cell_params.items()}
+    missing = [cell for cell, quote in cells.items() if quote is None]
+    property_details = response_cache.get("price_property", {"property": property_id})
+    if property_details is None and len(missing) == 0:
+        missing = list(cells)[:1]
+
+    async with admitted("get_price_matrix") if len(missing) > 0 else nullcontext(), PriceSession() as session:
+        session.property = property_details
+        limiter = asyncio.Semaphore(max(1, settings.price_matrix_concurrency))
+
+        async def price_cell(cell: tuple):
+            params = cell_params[cell]
+            target_url = f'{booking_request_url}?{urlencode(params)}'
+
+            async def produce():
+                async with limiter:
+                    pricing, _ = await session.quote(target_url)
+                if "total" not in pricing:
+                    return None
+                return jsonable_encoder({"total": pricing["total"], "nights": pricing["nights"]})
+
+            try:
+                cells[cell] = await single_flight.run(response_cache.key("price_cell", params), produce)
+            except Exception as error:
+                tracing.error("price_cell", error, **params)
+                return
+            if cells[cell] is not None:
+                response_cache.set("price_cell", params, cells[cell])
+
+        await asyncio.gather(*[price_cell(z) for z in missing])
+        if property_details is None and session.property is not None:
+            property_details = jsonable_encoder(session.property)
+            response_cache.set("price_property", {"property": property_id}, property_details)
+
+    return dict(result=dict(
+        property=property_details,
+        arrivals=arrivals,
+        stay_lengths=stay_lengths,
+        totals=[[(cells[(arrival, nights)] or {}).get("total") for nights in stay_lengths] for arrival in arrivals],
+        nights=[[(cells[(arrival, nights)] or {}).get("nights") for nights in stay_lengths] for arrival in arrivals],
+    ), cells=dict(cached=len(cells) - len(missing), fetched=len(missing)))
+
+
+@app.post("/get_prices", tags=["Headless"], include_in_schema=True)
+async def get_prices(batch: PriceBatch):
+    if os.getenv('API_REQUEST') != batch.watermark:
+        raise HTTPException(401)
+    if len(batch.items) > settings.price_batch_max_items:
+        raise HTTPException(400, detail=f'{len(batch.items)} items is more than the maximum of {settings.price_batch_max_items}')
+
+    unique_items: dict[tuple, list[int]] = {}
+    for index, item in enumerate(batch.items):
+        key = (item.property_id, item.arrival, item.departure, item.adults, item.children)
+        unique_items.setdefault(key, []).append(index)
+
+    limiter = asyncio.Semaphore(max(1, settings.price_batch_concurrency))
+
+    async def price_item(key: tuple, indexes: list[int]) -> dict:
+        item = dict(zip(["property_id", "arrival", "departure", "adults", "children"], key))
+        try:
+            async with limiter:
+                return dict(indexes=indexes, item=item, **await quote_price(*key))
+        except HTTPException as error:
+            return dict(indexes=indexes, item=item, error=HTTPException.__name__, status=error.status_code,
+                        messages=[error.detail])
+        except Exception as error:
+            return dict(indexes=indexes, item=item, error=error.__class__.__name__,
+                        messages=[str(z) for z in error.args])
+
+    async def stream_prices():
+        pending = [asyncio.create_task(price_item(key, indexes)) for key, indexes in unique_items.items()]
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield (json.dumps(jsonable_encoder(await finished)) + "\n").encode()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(stream_prices(), media_type="application/x-ndjson")
 
 
 @app.post("/retrieve_price", tags=["Headless"], include_in_schema=True)
@@ -129,36 +435,64 @@ async def direct_price(target: RequestTarget):
         raise HTTPException(400, detail=f"Invalid url {target.target_url}")
     if os.getenv('API_REQUEST') != target.watermark:
         raise HTTPException(401)
-    ic(target)
-    response = ic(await scrape_price_url(target.target_url))
-    return dict(result=response)
+    target_url = fill_in_target_url(target)
+    tracing.debug("retrieve_price", target_url=target_url)
+
+    async def produce():
+        response, tier = await scrape_price_url(target_url)
+        return dict(result=response, tier=tier)
+
+    return await cached_response("retrieve_price", {"target_url": target_url}, produce)
 
 
-@alru_cache(ttl=3600)
 @app.post("/retrieve_reviews", tags=["Headless"], include_in_schema=True)
-async def direct_reviews(target: RequestTarget):
+async def direct_reviews(target: ReviewsTarget):
     if not is_valid_url(target.target_url):
         raise HTTPException(400, detail=f"Invalid url {target.target_url}")
     if os.getenv('API_REQUEST') != target.watermark:
         raise HTTPException(401)
-    reviews_url = ic(fill_in_target_url(target, "reviews"))
-    response = ic(await scrape_reviews_url(reviews_url))
-    return dict(result=response)
+    reviews_url = fill_in_target_url(target, "reviews")
+    response = await cached_response(*reviews_request(reviews_url))
+    if target.since is None:
+        return response
+    return dict(result=review_store.reviews(reviews_url, target.since))
+
+
+def reviews_request(reviews_url: str) -> tuple:
+    async def produce():
+        response = await scrape_reviews_url(reviews_url)
+        return dict(result=response)
+
+    return "retrieve_reviews", {"target_url": reviews_url}, produce
 
 
-@alru_cache(ttl=3600)
 @app.post("/retrieve_properties", tags=["Headless"], include_in_schema=True)
-async def direct_properties(target: RequestTarget):
+async def direct_properties(target: PropertiesTarget):
     if not is_valid_url(target.target_url):
         raise HTTPException(400, detail=f"Invalid url {target.target_url}")
     if os.getenv('API_REQUEST') != target.watermark:
         raise HTTPException(401)
-    property_url = ic(fill_in_target_url(target, "properties"))
-    response = ic(await scrape_properties_url(property_url))
-    if len(response) == 0:
-        property_url = ic(fill_in_target_url(target))
-        response = ic(await scrape_properties_url(property_url))
-    return dict(result=response)
+    property_url = fill_in_target_url(target, "properties")
+    enriched_params = {"target_url": property_url, "rental_details": "inline"}
+    if target.rental_details == "deferred":
+        enriched = response_cache.get("retrieve_properties", enriched_params)
+        if enriched is not None:
+            return enriched
+
+    async def produce():
+        response = await scrape_properties_url(property_url, target.rental_details)
+        if len(response) == 0:
+            fallback_url = fill_in_target_url(target)
+            tracing.debug("properties_fallback", target_url=fallback_url)
+            response = await scrape_properties_url(fallback_url, target.rental_details)
+        if target.rental_details == "deferred":
+            # The enriched listing is handed to every worker through the shared cache as the inline response
+            defer_rental_details(copy.deepcopy(response), lambda properties: response_cache.set(
+                "retrieve_properties", enriched_params, jsonable_encoder(dict(result=properties))))
+        return dict(result=response)
+
+    return await cached_response("retrieve_properties",
+                                 {"target_url": property_url, "rental_details": target.rental_details}, produce)
 
 
 def fill_in_target_url(target: RequestTarget, action_path: str = "") -> str:
@@ -174,6 +508,34 @@ def fill_in_target_url(target: RequestTarget, action_path: str = "") -> str:
     return target_url
 
 
+@app.get("/status", tags=["Headless"], include_in_schema=True)
+async def status(watermark: Annotated[str, "Watermark"] = ""):
+    if os.getenv('API_REQUEST') != watermark:
+        raise HTTPException(401)
+    return dict(result={
+        "pid": os.getpid(),
+        "browser_pool": browser_pool.stats(),
+        "http_client": http_client.stats(),
+        "revalidation": revalidating_cache.stats(),
+        "price_tiers": price_tier_stats(),
+        "quote_registry": quote_registry.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "cache_warmer": cache_warmer.stats(),
+        "admission": admission.stats(),
+        "review_store": review_store.stats(),
+        "parsing": parsing_stats(),
+        "extractors": extractors.stats(),
+    })
+
+
+@app.get("/metrics", tags=["Headless"], include_in_schema=True)
+async def metrics(watermark: Annotated[str, "Watermark"] = ""):
+    if os.getenv('API_REQUEST') != watermark:
+        raise HTTPException(401)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/", tags=["Headless"], include_in_schema=False)
 async def to_docs():
     return RedirectResponse("/docs")
@@ -0,0 +1,110 @@
+import argparse
+import json
+import statistics
+import timeit
+from dataclasses import asdict, is_dataclass
+from datetime import date, timedelta
+
+from bench import pages, results
+from core import settings
+from core.Availability import extract_availability
+from core.Property import parse_properties, parse_listing_page
+from core.Review import extract_review_page_links
+from core.VacationRental import parse_vacation_rental
+from core.runner import extract_pricing, parse_reviews
+
+app_url = "https://app.ownerrez.com"
+parser_variants = [("html.parser", False), ("html.parser", True), ("lxml", False), ("lxml", True)]
+
+
+def extractor_cases(today: date) -> dict:
+    arrival = today + timedelta(days=30)
+    departure = arrival + timedelta(days=7)
+    booking_url = (f'https://booking.ownerrez.com/request?property=101&arrival={arrival.isoformat()}'
+                   f'&departure={departure.isoformat()}&adults=2&children=0')
+    booking_page = pages.booking_request("101", arrival, departure, today=today)
+    tiles_page = pages.properties_tiles(pager=False)
+    pager_page = pages.properties_tiles()
+    list_page = pages.properties_list()
+    widget_page = pages.reviews_widget(4)
+    review_page = pages.review_page(2)
+    rental_page = pages.vacation_rental(app_url, "101")
+    booking_bytes = booking_page.encode()
+    return {
+        "pricing": lambda: extract_pricing(booking_page, booking_url),
+        "availability": lambda: [z.to_dict() for z in extract_availability(booking_bytes)],
+        "properties_tiles": lambda: parse_properties(tiles_page, "https://example.test/properties"),
+        "properties_pager": lambda: parse_listing_page(pager_page, "https://example.test/properties"),
+        "properties_list": lambda: parse_properties(list_page, "https://example.test/list/properties"),
+        "review_links": lambda: extract_review_page_links(widget_page, app_url),
+        "reviews": lambda: parse_reviews(review_page),
+        "vacation_rental": lambda: parse_vacation_rental(rental_page),
+    }
+
+
+def normalized(value):
+    if is_dataclass(value):
+        value = asdict(value)
+    return json.loads(json.dumps(value, default=lambda z: asdict(z) if is_dataclass(z) else str(z), sort_keys=True))
+
+
+def use_parser(parser: str, parse_only: bool):
+    settings.html_parser = parser
+    settings.html_parse_only = parse_only
+
+
+def measure(case, number: int, repeat: int) -> dict:
+    timings = [z / number for z in timeit.repeat(case, number=number, repeat=repeat)]
+    return {
+        "per_call_ms": statistics.median(timings) * 1000,
+        "best_ms": min(timings) * 1000,
+        "calls_per_second": 1 / statistics.median(timings),
+    }
+
+
+def check_parity(cases: dict) -> list[str]:
+    mismatches = []
+    use_parser(*parser_variants[0])
+    baseline = {name: normalized(case()) for name, case in cases.items()}
+    for variant in parser_variants[1:]:
+        use_parser(*variant)
+        for name, case in cases.items():
+            if normalized(case()) != baseline[name]:
+                mismatches.append(f'{name}: {variant[0]} parse_only={variant[1]} differs from '
+                                  f'{parser_variants[0][0]} parse_only={parser_variants[0][1]}')
+    return mismatches
+
+
+def run(number: int, repeat: int, only: list[str]) -> dict:
+    cases = extractor_cases(date.today())
+    if only:
+        cases = {name: case for name, case in cases.items() if name in only}
+    measured = {}
+    for parser, parse_only in parser_variants:
+        use_parser(parser, parse_only)
+        for name, case in cases.items():
+            measured[f'{name}[{parser}{",parse_only" if parse_only else ""}]'] = measure(case, number, repeat)
+    return measured
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Time each extractor against the bench fixtures")
+    arguments.add_argument("--number", type=int, default=50, help="Calls per timing sample")
+    arguments.add_argument("--repeat", type=int, default=5, help="Timing samples per case")
+    arguments.add_argument("--only", nargs="*", default=[], help="Extractor cases to run")
+    arguments.add_argument("--save", help="Save the run under bench/results/extractors-<name>.json")
+    options = arguments.parse_args()
+
+    parity = check_parity(extractor_cases(date.today()))
+    for mismatch in parity:
+        print(f'PARITY {mismatch}')
+
+    measured = run(options.number, options.repeat, options.only)
+    print(f'{"case":<45} {"per call ms":>12} {"best ms":>10} {"calls/s":>10}')
+    for case_name, case_result in measured.items():
+        print(f'{case_name:<45} {case_result["per_call_ms"]:>12.3f} {case_result["best_ms"]:>10.3f} '
+              f'{case_result["calls_per_second"]:>10.0f}')
+    if options.save:
+        print(f'Saved {results.save("extractors", options.save, measured, vars(options))}')
+    if len(parity) > 0:
+        raise SystemExit(1)
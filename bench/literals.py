@@ -0,0 +1,76 @@
+from core.Availability import extract_availability
+from core.literals import LiteralError, parse_literal
+
+parsed_cases = {
+    "empty": (b'[]', []),
+    "strings and numbers": (b'["2030-01-01", 2, -1.5e2, true, null]', ["2030-01-01", 2, -150.0, True, None]),
+    "single quotes": (b"['a', \"b\"]", ["a", "b"]),
+    "escapes": (b'["a\\"b", "tab\\tend", "\\u00e9t\\u00E9", "back\\\\slash"]',
+                ['a"b', "tab\tend", "été", "back\\slash"]),
+    "trailing comma": (b'[1, 2, ]', [1, 2]),
+    "nested": (b'[[1, ["2030-01-01", "2030-01-03"]], [], [[[]]]]', [[1, ["2030-01-01", "2030-01-03"]], [], [[[]]]]),
+    "deeply nested": (b'[' * 10000 + b']' * 10000, None),
+}
+
+malformed_cases = {
+    "truncated array": b'[1, 2',
+    "truncated nested array": b'[[1, 2], [3',
+    "truncated string": b'["2030-01-01',
+    "truncated escape": b'["\\',
+    "truncated unicode escape": b'["\\u12',
+    "short unicode escape": b'["\\u12"]',
+    "non-hex unicode escape": b'["\\uzzzz"]',
+    "signed unicode escape": b'["\\u+1_2"]',
+    "missing comma": b'[1 2]',
+    "bad number": b'[1.2.3]',
+    "unexpected character": b'[{"a": 1}]',
+    "empty input": b'',
+}
+
+availability_pages = {
+    "malformed page keeps the other calendars": (
+        b'<script>var bookedDates = ["\\u12"]; var bookedDates = ["2030-01-01"];</script>', 1),
+    "truncated page": (b'<script>var bookedDates = ["2030-01-01", ["a", "2030', 0),
+}
+
+
+def check_literals() -> list[str]:
+    failures = []
+    for name, (source, expected) in parsed_cases.items():
+        try:
+            value, position = parse_literal(source)
+        except Exception as error:
+            failures.append(f'{name}: raised {error.__class__.__name__} {error}')
+            continue
+        if position != len(source):
+            failures.append(f'{name}: stopped at {position} of {len(source)}')
+        if expected is not None and value != expected:
+            failures.append(f'{name}: parsed {value!r}, expected {expected!r}')
+
+    for name, source in malformed_cases.items():
+        try:
+            value, _ = parse_literal(source)
+            failures.append(f'{name}: parsed {value!r} instead of raising LiteralError')
+        except LiteralError:
+            pass
+        except Exception as error:
+            failures.append(f'{name}: raised {error.__class__.__name__} instead of LiteralError')
+
+    for name, (page, calendars) in availability_pages.items():
+        try:
+            found = len(extract_availability(page))
+        except Exception as error:
+            failures.append(f'{name}: raised {error.__class__.__name__} {error}')
+            continue
+        if found != calendars:
+            failures.append(f'{name}: found {found} calendars, expected {calendars}')
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_literals()
+    for failure in failures:
+        print(f'LITERAL {failure}')
+    if len(failures) > 0:
+        raise SystemExit(1)
+    print(f'{len(parsed_cases) + len(malformed_cases) + len(availability_pages)} literal cases behave as expected')
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import random
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+fixtures_path = Path(__file__).parent / "fixtures"
+
+property_names = ["Bench Creek Cabin", "Ridge Top Lodge", "Laurel Cottage", "Riverbend House", "Hemlock Hideaway",
+                  "Summit Chalet"]
+reviewer_names = ["Sam R.", "Ana", "Priya K.", "Jordan", "Lee W.", "Morgan T.", "Chris", "Dana P."]
+review_titles = ["Perfect weekend getaway", "Great stay", "Would book again", "Beautiful views", "Cozy and clean",
+                 "Exactly as described"]
+reviews_per_page = 5
+
+
+@lru_cache(maxsize=None)
+def fixture(name: str) -> str:
+    return (fixtures_path / name).read_text()
+
+
+def render(fixture_name: str, **values) -> str:
+    page = fixture(fixture_name)
+    for key, value in values.items():
+        page = page.replace(f'__{key.upper()}__', str(value))
+    return page
+
+
+def nightly_rate(property_id: str) -> int:
+    return 150 + int(hashlib.sha256(property_id.encode()).hexdigest(), 16) % 100
+
+
+def price_quote(property_id: str, arrival: date, departure: date) -> dict:
+    nights = max(1, (departure - arrival).days)
+    rent = nightly_rate(property_id) * nights
+    tax = round(rent * 0.12, 2)
+    total = round(rent + 150 + tax, 2)
+    return {"nights": nights, "rent": rent, "tax": tax, "total": total}
+
+
+def booked_dates(property_id: str, today: date, bookings: int = 120) -> list:
+    generator = random.Random(property_id)
+    booked = []
+    cursor = today - timedelta(days=30)
+    for index in range(bookings):
+        cursor += timedelta(days=generator.randint(1, 6))
+        nights = generator.randint(1, 7)
+        if nights == 1:
+            booked.append(f'{cursor.isoformat()}T00:00:00')
+        else:
+            booked.append([index, f'{cursor.isoformat()}T00:00:00',
+                           f'{(cursor + timedelta(days=nights - 1)).isoformat()}T00:00:00'])
+        cursor += timedelta(days=nights)
+    return booked
+
+
+def booking_request(property_id: str, arrival: date, departure: date, adults: int = 2, children: int = 0,
+                    today: date = None) -> str:
+    quote = price_quote(property_id, arrival, departure)
+    return render("booking_request.html", property=property_id, arrival=arrival.isoformat(),
+                  departure=departure.isoformat(), adults=adults, children=children,
+                  rent=f'${quote["rent"]:,.2f}', tax=f'${quote["tax"]:,.2f}', total=f'${quote["total"]:,.2f}',
+                  deposit=f'${quote["total"] / 2:,.2f}',
+                  booked_dates=json.dumps(booked_dates(property_id, today or date.today())))
+
+
+def price_widget(app_url: str, property_id: str) -> str:
+    return render("price_widget.html", app_url=app_url, property=property_id)
+
+
+def quote_json(property_id: str, arrival: date, departure: date) -> str:
+    quote = price_quote(property_id, arrival, departure)
+    return render("quote.json", property=property_id, arrival=arrival.isoformat(), departure=departure.isoformat(),
+                  nights=quote["nights"], rent_amount=quote["rent"], tax_amount=quote["tax"],
+                  total_amount=quote["total"])
+
+
+def properties_tiles(pager: bool = True) -> str:
+    return render("properties_tiles.html", pager=fixture("properties_pager.html") if pager else "")
+
+
+def properties_list() -> str:
+    return fixture("properties_list.html")
+
+
+def vacation_rental(app_url: str, property_id: str) -> str:
+    index = int(property_id) % len(property_names) if property_id.isdigit() else 0
+    return render("vacation_rental.html", property=property_id, name=property_names[index],
+                  property_url=f'{app_url}/property/{property_id}')
+
+
+def review_items(page: int, today: date = None) -> str:
+    today = today or date.today()
+    items = []
+    for index in range(reviews_per_page):
+        position = (page - 1) * reviews_per_page + index
+        stayed = (today.replace(day=1) - timedelta(days=30 * position)).strftime("%B %Y")
+        reviewer = reviewer_names[position % len(reviewer_names)]
+        if position % 3 == 0:
+            by_line = f'By {reviewer} – stayed at {property_names[position % len(property_names)]} in {stayed}'
+        else:
+            by_line = f'By {reviewer}, stayed {stayed}'
+        items.append(render("review_item.html", title=f'{review_titles[position % len(review_titles)]} #{position + 1}',
+                            by_line=by_line, extra_star='<span class="fa fa-star"></span>' if position % 4 else "",
+                            content=f'Stay {position + 1}: the cabin was spotless and the hosts were quick to reply.',
+                            response="Thanks for staying with us!" if position % 2 else ""))
+    return "\n".join(items)
+
+
+def reviews_host(app_url: str) -> str:
+    return render("reviews.html", app_url=app_url)
+
+
+def reviews_widget(pages: int) -> str:
+    links = [f'<li><a href="/widgets/GetReviews?widgetId=bench-reviews&amp;pageSize={reviews_per_page}'
+             f'&amp;pageNumber={z}">{z}</a></li>' for z in range(1, pages + 1)]
+    return render("reviews_widget.html", review_count=pages * reviews_per_page, review_items=review_items(1),
+                  pager_links="\n".join(links))
+
+
+def review_page(page: int) -> str:
+    return render("review_page.html", review_items=review_items(page))
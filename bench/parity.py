@@ -0,0 +1,78 @@
+from bs4 import BeautifulSoup
+
+from core.parsing import class_strainer
+
+parsers = ["html.parser", "lxml"]
+
+corpus = {
+    "pricing": (["card-body", "card-img-top", "card-title", "card-subtitle"], """
+        <div class="card shadow-sm">
+            <div class="card-img-top rounded" style="background-image:url(https://uc.orez.io/i/cabin.jpg);"></div>
+            <div class="card-body p-3">
+                <h5 class="card-title mb-0">Bench Creek Cabin</h5>
+                <h6 class="card-subtitle text-muted">Asheville, NC, United States</h6>
+            </div>
+            <div class="card-body">
+                <table class="table table-sm">
+                    <tbody><tr><td>Rent</td><td>$968.00</td></tr></tbody>
+                    <tfoot><tr><td>Total</td><td>$1,234.16</td></tr></tfoot>
+                </table>
+            </div>
+        </div>"""),
+    "reviews": (["review-item"], """
+        <div class="review-item clearfix">
+            <span class="fa fa-star"></span><span class="fa fa-star"></span>
+            <span class="review-item-title">Great stay</span>
+            <div class="review-item-by-line">By Sam R., stayed March 2024</div>
+            <div class="has-read-more"><p>Spotless cabin.</p><p>Thanks!</p></div>
+        </div>
+        <div class="review-item">
+            <span class="review-item-title">Would book again</span>
+        </div>"""),
+    "review_pager": (["reviews-pager"], """
+        <div class="reviews-pager text-center">
+            <a href="/widgets/GetReviews?widgetId=w&amp;pageNumber=1">1</a>
+            <a href="/widgets/GetReviews?widgetId=w&amp;pageNumber=2">2</a>
+        </div>"""),
+    "listing": (["property-result-tile", "property-result-list"], """
+        <a class="property-result-tile col-md-4" href="/property/101">
+            <img src="https://uc.orez.io/i/101.jpg">
+            <span class="h3 media-heading">Bench Creek Cabin</span>
+            <span class="caption">Sleeps 8 &middot; 3 bedrooms &middot; 2 baths</span>
+        </a>
+        <div class="property-result-list list-unstyled">
+            <div class="row"><div><h2 class="media-heading"><a href="/property/201">Valley Farmhouse</a></h2></div>
+            <div><div class="amenity-summary-size"><span>4 Bedrooms</span></div></div></div>
+        </div>"""),
+    "listing_pager": (["result-page"], """
+        <ul class="pagination">
+            <li><a class="result-page page-link" data-page="1" href="?page=1">1</a></li>
+            <li><a class="result-page" data-page="2" href="?page=2">2</a></li>
+        </ul>"""),
+}
+
+
+def matched(soup: BeautifulSoup, class_names: list[str]) -> list[str]:
+    return [str(z) for z in soup.find_all(class_=class_names)]
+
+
+def check_parity() -> list[str]:
+    mismatches = []
+    for name, (class_names, page) in corpus.items():
+        expected = matched(BeautifulSoup(page, "html.parser"), class_names)
+        for parser in parsers:
+            for strainer in [None, class_strainer(*class_names)]:
+                found = matched(BeautifulSoup(page, parser, parse_only=strainer), class_names)
+                if found != expected:
+                    mismatches.append(f'{name}: {parser} {"with" if strainer else "without"} strainer found '
+                                      f'{len(found)} of {len(expected)} elements')
+    return mismatches
+
+
+if __name__ == "__main__":
+    parity = check_parity()
+    for mismatch in parity:
+        print(f'PARITY {mismatch}')
+    if len(parity) > 0:
+        raise SystemExit(1)
+    print(f'{len(corpus)} fixtures match across {", ".join(parsers)} with and without strainers')
@@ -0,0 +1,102 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+results_path = Path(__file__).parent / "results"
+
+compared_metrics = {"requests_per_second", "p50_ms", "p95_ms", "p99_ms", "errors", "per_call_ms", "calls_per_second"}
+higher_is_better = {"requests_per_second", "calls_per_second"}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save(kind: str, name: str, results: dict, options: dict) -> Path:
+    results_path.mkdir(exist_ok=True)
+    run = {
+        "kind": kind,
+        "name": name,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "options": options,
+        "results": results,
+    }
+    target = results_path / f'{kind}-{name}.json'
+    target.write_text(json.dumps(run, indent=2, default=str))
+    return target
+
+
+def load(path: str) -> dict:
+    candidate = Path(path)
+    if not candidate.exists():
+        candidate = results_path / path
+    if not candidate.exists():
+        candidate = results_path / f'{path}.json'
+    if not candidate.exists():
+        matches = sorted(results_path.glob(f'*-{path}.json'))
+        if len(matches) != 1:
+            raise SystemExit(f'No single saved run named {path}')
+        candidate = matches[0]
+    return json.loads(candidate.read_text())
+
+
+def compare(baseline: dict, current: dict) -> list[dict]:
+    rows = []
+    for case, baseline_metrics in baseline["results"].items():
+        current_metrics = current["results"].get(case)
+        if current_metrics is None:
+            continue
+        for metric, baseline_value in baseline_metrics.items():
+            if metric not in compared_metrics:
+                continue
+            current_value = current_metrics.get(metric)
+            if not isinstance(baseline_value, (int, float)) or not isinstance(current_value, (int, float)):
+                continue
+            change = None if baseline_value == 0 else (current_value - baseline_value) / baseline_value
+            improved = None if change is None else (change > 0) == (metric in higher_is_better)
+            rows.append({"case": case, "metric": metric, "baseline": baseline_value, "current": current_value,
+                         "change": change, "improved": improved if change else None})
+    return rows
+
+
+def print_comparison(rows: list[dict], threshold: float):
+    print(f'{"case":<40} {"metric":<22} {"baseline":>12} {"current":>12} {"change":>9}')
+    for row in rows:
+        change = "n/a" if row["change"] is None else f'{row["change"]:+.1%}'
+        flag = ""
+        if row["change"] is not None and abs(row["change"]) >= threshold:
+            flag = "  better" if row["improved"] else "  WORSE"
+        print(f'{row["case"]:<40} {row["metric"]:<22} {row["baseline"]:>12.4g} {row["current"]:>12.4g} '
+              f'{change:>9}{flag}')
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="List or compare saved benchmark runs")
+    commands = arguments.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    compare_command = commands.add_parser("compare")
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("current")
+    compare_command.add_argument("--threshold", type=float, default=0.05,
+                                 help="Flag changes at least this large (0.05 = 5%%)")
+    options = arguments.parse_args()
+
+    if options.command == "list":
+        for saved in sorted(results_path.glob("*.json")):
+            run = json.loads(saved.read_text())
+            print(f'{saved.name:<40} {run["created"]:<26} {run.get("revision") or "":<10} {len(run["results"])} cases')
+    else:
+        baseline_run, current_run = load(options.baseline), load(options.current)
+        if baseline_run["kind"] != current_run["kind"]:
+            raise SystemExit(f'Cannot compare a {baseline_run["kind"]} run with a {current_run["kind"]} run')
+        print_comparison(compare(baseline_run, current_run), options.threshold)
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+from bench import results
+
+repository_path = Path(__file__).parent.parent
+browser_routes = {"properties", "reviews"}
+
+
+def route_cases(upstream_url: str, watermark: str, cold: bool) -> dict:
+    first_arrival = date.today() + timedelta(days=30)
+
+    def stay(index: int, nights: int = 7) -> tuple[str, str]:
+        arrival = first_arrival + timedelta(days=index % 300 if cold else 0)
+        return arrival.isoformat(), (arrival + timedelta(days=nights)).isoformat()
+
+    def property_id(index: int) -> str:
+        return str(1000 + index if cold else 101)
+
+    def availability(index: int) -> dict:
+        return {"method": "GET", "url": f'/get_availability/{property_id(index)}',
+                "params": {"watermark": watermark, "view": "ranges"}}
+
+    def price(index: int) -> dict:
+        arrival, departure = stay(index)
+        return {"method": "GET", "url": f'/get_price/{property_id(index)}',
+                "params": {"watermark": watermark, "arrival": arrival, "departure": departure, "adults": 2}}
+
+    def price_matrix(index: int) -> dict:
+        start, end = stay(index, 6)
+        return {"method": "GET", "url": f'/get_price_matrix/{property_id(index)}',
+                "params": {"watermark": watermark, "start": start, "end": end, "stay_lengths": [3, 7]}}
+
+    def prices(index: int) -> dict:
+        items = []
+        for offset in range(5):
+            arrival, departure = stay(index * 5 + offset)
+            items.append({"property_id": property_id(index), "arrival": arrival, "departure": departure})
+        return {"method": "POST", "url": "/get_prices", "json": {"watermark": watermark, "items": items}}
+
+    def retrieve_price(index: int) -> dict:
+        arrival, departure = stay(index)
+        return {"method": "POST", "url": "/retrieve_price",
+                "json": {"watermark": watermark, "target_url": f'{upstream_url}/request?property={property_id(index)}'
+                                                              f'&arrival={arrival}&departure={departure}&adults=2'}}
+
+    def properties(index: int) -> dict:
+        return {"method": "POST", "url": "/retrieve_properties",
+                "json": {"watermark": watermark, "target_url": upstream_url, "rental_details": "inline"}}
+
+    def reviews(index: int) -> dict:
+        return {"method": "POST", "url": "/retrieve_reviews", "json": {"watermark": watermark, "target_url": upstream_url}}
+
+    def status(index: int) -> dict:
+        return {"method": "GET", "url": "/status", "params": {"watermark": watermark}}
+
+    return {
+        "status": status,
+        "availability": availability,
+        "price": price,
+        "price_matrix": price_matrix,
+        "prices": prices,
+        "retrieve_price": retrieve_price,
+        "properties": properties,
+        "reviews": reviews,
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if len(values) == 0:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+async def load(client: httpx.AsyncClient, case, requests: int, concurrency: int, first_index: int = 0) -> dict:
+    latencies = []
+    errors = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**case(first_index + index))
+                await response.aread()
+                if response.status_code >= 400:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                    continue
+            except httpx.HTTPError as error:
+                errors[error.__class__.__name__] = errors.get(error.__class__.__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed > 0 else 0,
+        "p50_ms": None if len(latencies) == 0 else percentile(latencies, 0.50) * 1000,
+        "p95_ms": None if len(latencies) == 0 else percentile(latencies, 0.95) * 1000,
+        "p99_ms": None if len(latencies) == 0 else percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def wait_until_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=2)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise SystemExit(f'{url} did not answer within {timeout} seconds')
+
+
+def start_upstream(port: int, latency: float, jitter: float) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "bench.server", "--port", str(port), "--latency", str(latency),
+                             "--jitter", str(jitter)], cwd=repository_path)
+
+
+def start_app(port: int, workers: int, upstream_url: str, watermark: str, state_path: str) -> subprocess.Popen:
+    environment = {
+        **os.environ,
+        "API_REQUEST": watermark,
+        "OWNERREZ_APP_URL": upstream_url,
+        "OWNERREZ_BOOKING_URL": upstream_url,
+        "SHARED_CACHE_PATH": os.path.join(state_path, "cache.sqlite3"),
+        "SINGLE_FLIGHT_LOCK_DIRECTORY": os.path.join(state_path, "locks"),
+        "CACHE_WARM_LOCK_PATH": os.path.join(state_path, "warmer.lock"),
+        "REVIEW_STORE_PATH": os.path.join(state_path, "reviews.sqlite3"),
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(state_path, "metrics"),
+    }
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", "app:app", "-c", "gunicorn_config.py",
+                             "--bind", f'127.0.0.1:{port}', "--workers", str(workers)],
+                            cwd=repository_path, env=environment)
+
+
+async def run(options) -> dict:
+    processes = []
+    upstream_url = options.upstream_url
+    app_url = options.app_url
+    try:
+        if upstream_url is None:
+            upstream_url = f'http://127.0.0.1:{options.upstream_port}'
+            processes.append(start_upstream(options.upstream_port, options.latency, options.jitter))
+        await wait_until_ready(f'{upstream_url}/properties', options.startup_timeout)
+        if app_url is None:
+            app_url = f'http://127.0.0.1:{options.app_port}'
+            processes.append(start_app(options.app_port, options.workers, upstream_url, options.watermark,
+                                       tempfile.mkdtemp(prefix="headless-bench-")))
+        await wait_until_ready(f'{app_url}/status', options.startup_timeout)
+
+        cases = route_cases(upstream_url, options.watermark, options.cold)
+        measured = {}
+        limits = httpx.Limits(max_connections=max(options.concurrency), max_keepalive_connections=max(options.concurrency))
+        async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=options.timeout) as client:
+            for route in options.routes:
+                await load(client, cases[route], options.warmup, 1)
+                first_index = options.warmup
+                for concurrency in options.concurrency:
+                    case_name = f'{route}@{concurrency}'
+                    measured[case_name] = await load(client, cases[route], options.requests, concurrency, first_index)
+                    first_index += options.requests
+                    print_result(case_name, measured[case_name])
+        return measured
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def print_result(case_name: str, case_result: dict):
+    def milliseconds(value):
+        return "n/a" if value is None else f'{value:.1f}'
+
+    print(f'{case_name:<24} {case_result["requests_per_second"]:>9.1f} req/s  p50 {milliseconds(case_result["p50_ms"]):>8}'
+          f'  p95 {milliseconds(case_result["p95_ms"]):>8}  p99 {milliseconds(case_result["p99_ms"]):>8}'
+          f'  errors {case_result["errors"]} {case_result["error_kinds"] or ""}', flush=True)
+
+
+if __name__ == "__main__":
+    all_routes = list(route_cases("", "", False))
+    arguments = argparse.ArgumentParser(description="Measure throughput and tail latency per route")
+    arguments.add_argument("--routes", nargs="*", choices=all_routes,
+                           default=[z for z in all_routes if z not in browser_routes])
+    arguments.add_argument("--concurrency", nargs="*", type=int, default=[1, 8, 32])
+    arguments.add_argument("--requests", type=int, default=200, help="Requests per route and concurrency level")
+    arguments.add_argument("--warmup", type=int, default=5, help="Sequential requests before measuring a route")
+    arguments.add_argument("--cold", action="store_true", help="Vary parameters so every request misses the caches")
+    arguments.add_argument("--timeout", type=float, default=60.0)
+    arguments.add_argument("--latency", type=float, default=0.05, help="Stand-in upstream latency in seconds")
+    arguments.add_argument("--jitter", type=float, default=0.02)
+    arguments.add_argument("--workers", type=int, default=2, help="Gunicorn workers for the app under test")
+    arguments.add_argument("--app-url", help="Measure an app that is already running instead of starting one")
+    arguments.add_argument("--app-port", type=int, default=8081)
+    arguments.add_argument("--upstream-url", help="Use a stand-in upstream that is already running")
+    arguments.add_argument("--upstream-port", type=int, default=8765)
+    arguments.add_argument("--watermark", default=os.getenv("API_REQUEST", "bench"))
+    arguments.add_argument("--startup-timeout", type=float, default=60.0)
+    arguments.add_argument("--save", help="Save the run under bench/results/routes-<name>.json")
+    options = arguments.parse_args()
+
+    measured = asyncio.run(run(options))
+    if options.save:
+        print(f'Saved {results.save("routes", options.save, measured, vars(options))}')
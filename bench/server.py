@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import hashlib
+import random
+from datetime import date, timedelta
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from bench import pages
+
+
+def query_date(request: Request, name: str, default: date) -> date:
+    try:
+        return date.fromisoformat(request.query_params.get(name, "")[:10])
+    except ValueError:
+        return default
+
+
+def page_response(request: Request, content: str, media_type: str = "text/html") -> Response:
+    etag = f'"{hashlib.sha256(content.encode()).hexdigest()[:32]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content, media_type=media_type, headers={"ETag": etag})
+
+
+def create_app(latency: float = 0.05, jitter: float = 0.02, review_pages: int = 4) -> Starlette:
+    def app_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    def stay(request: Request) -> tuple[str, date, date]:
+        arrival = query_date(request, "arrival", date.today() + timedelta(days=30))
+        departure = query_date(request, "departure", arrival + timedelta(days=7))
+        return request.query_params.get("property", "101"), arrival, departure
+
+    async def booking_request(request: Request):
+        property_id, arrival, departure = stay(request)
+        return page_response(request, pages.booking_request(property_id, arrival, departure,
+                                                            request.query_params.get("adults", "2"),
+                                                            request.query_params.get("children", "0")))
+
+    async def book(request: Request):
+        return page_response(request, pages.price_widget(app_url(request), request.query_params.get("property", "101")))
+
+    async def quote(request: Request):
+        return page_response(request, pages.quote_json(*stay(request)), "application/json")
+
+    async def properties(request: Request):
+        return page_response(request, pages.properties_tiles())
+
+    async def properties_list(request: Request):
+        return page_response(request, pages.properties_list())
+
+    async def property_page(request: Request):
+        return page_response(request, pages.vacation_rental(app_url(request), request.path_params["property_id"]))
+
+    async def reviews(request: Request):
+        return page_response(request, pages.reviews_host(app_url(request)))
+
+    async def reviews_widget(request: Request):
+        return page_response(request, pages.reviews_widget(review_pages))
+
+    async def review_page(request: Request):
+        query = {key.lower(): value for key, value in request.query_params.items()}
+        try:
+            page = int(query.get("pagenumber", "1"))
+        except ValueError:
+            page = 1
+        if page < 1 or page > review_pages:
+            return page_response(request, "")
+        return page_response(request, pages.review_page(page))
+
+    async def delay(scope, receive, send):
+        if scope["type"] == "http" and latency > 0:
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        await starlette(scope, receive, send)
+
+    starlette = Starlette(routes=[
+        Route("/request", booking_request),
+        Route("/book", book),
+        Route("/widgets/quote", quote),
+        Route("/properties", properties),
+        Route("/list/properties", properties_list),
+        Route("/property/{property_id}", property_page),
+        Route("/reviews", reviews),
+        Route("/widgets/reviews", reviews_widget),
+        Route("/widgets/getreviews", review_page),
+        Route("/widgets/GetReviews", review_page),
+    ])
+    return delay
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Stand-in for the OwnerRez pages the scrapers read")
+    arguments.add_argument("--host", default="127.0.0.1")
+    arguments.add_argument("--port", type=int, default=8765)
+    arguments.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    arguments.add_argument("--jitter", type=float, default=0.02, help="Random +/- seconds around latency")
+    arguments.add_argument("--review-pages", type=int, default=4)
+    options = arguments.parse_args()
+    uvicorn.run(create_app(options.latency, options.jitter, options.review_pages), host=options.host,
+                port=options.port, log_level="warning")
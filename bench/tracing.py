@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import httpx
+from fastapi import FastAPI
+
+from core import tracing
+from core.tracing import tracer, DEBUG
+from middlewares.tracing import TracingMiddleware
+
+cases = {
+    "rate 0 with spans off": (False, 0.0, ["outside", "failed"]),
+    "rate 0 with spans on": (True, 0.0, ["outside", "failed"]),
+    "rate 1 with spans off": (False, 1.0, ["outside", "convert", "failed"]),
+    "rate 1 with spans on": (True, 1.0, ["outside", "convert", "failed"]),
+}
+
+
+def traced_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/convert")
+    async def convert():
+        tracing.debug("convert")
+        tracing.error("failed")
+        return {}
+
+    return app
+
+
+async def exported_events(spans: bool, sample_rate: float) -> list[str]:
+    with tempfile.TemporaryDirectory() as directory:
+        export_path = os.path.join(directory, "trace.jsonl")
+        tracer.level, tracer.spans, tracer.sample_rate, tracer.export_path = DEBUG, spans, sample_rate, export_path
+        tracer._file = None
+        tracing.debug("outside")
+        transport = httpx.ASGITransport(app=traced_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(20):
+                await client.get("/convert")
+        tracer._file.close()
+        with open(export_path) as exported:
+            records = [json.loads(z) for z in exported]
+    return list(dict.fromkeys(z["name"] for z in records if z["type"] == "event"))
+
+
+def check_tracing() -> list[str]:
+    failures = []
+    original = (tracer.level, tracer.spans, tracer.sample_rate, tracer.export_path)
+    try:
+        for name, (spans, sample_rate, expected) in cases.items():
+            found = asyncio.run(exported_events(spans, sample_rate))
+            if found != expected:
+                failures.append(f'{name}: exported {found}, expected {expected}')
+    finally:
+        tracer.level, tracer.spans, tracer.sample_rate, tracer.export_path = original
+        tracer._file = None
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_tracing()
+    for failure in failures:
+        print(f'TRACING {failure}')
+    if len(failures) > 0:
+        raise SystemExit(1)
+    print(f'{len(cases)} sampling cases export the expected events')
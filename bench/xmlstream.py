@@ -0,0 +1,56 @@
+import asyncio
+import tracemalloc
+
+from core.xmlstream import stream_records
+
+record_count = 200000
+peak_limit_bytes = 4 * 1024 * 1024
+
+documents = {
+    "flat": lambda z: f'<item id="{z}"><name>Cabin {z}</name></item>',
+    "wrapped": lambda z: f'<group id="{z}"><item id="{z}"><name>Cabin {z}</name></item></group>',
+    "mixed siblings": lambda z: f'<meta seq="{z}"><note>n</note></meta><item id="{z}"><name>Cabin {z}</name></item>',
+}
+
+
+async def document_chunks(render_record, count: int):
+    yield b'<?xml version="1.0"?><feed>'
+    batch = []
+    for index in range(count):
+        batch.append(render_record(index))
+        if len(batch) == 1000:
+            yield "".join(batch).encode()
+            batch = []
+    yield ("".join(batch) + "</feed>").encode()
+
+
+async def streamed_peak(render_record, count: int) -> tuple[int, int]:
+    records = 0
+    tracemalloc.start()
+    try:
+        async for line in stream_records(document_chunks(render_record, count), "item"):
+            records += line.startswith(b'{"item"')
+        return records, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def check_xmlstream(count: int = record_count) -> list[str]:
+    failures = []
+    for name, render_record in documents.items():
+        records, peak = asyncio.run(streamed_peak(render_record, count))
+        if records != count:
+            failures.append(f'{name}: streamed {records} of {count} records')
+        if peak > peak_limit_bytes:
+            failures.append(f'{name}: peak {peak / 1024 / 1024:.1f} MB over {peak_limit_bytes / 1024 / 1024:.0f} MB')
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_xmlstream()
+    for failure in failures:
+        print(f'XMLSTREAM {failure}')
+    if len(failures) > 0:
+        raise SystemExit(1)
+    print(f'{len(documents)} documents of {record_count} records streamed under '
+          f'{peak_limit_bytes / 1024 / 1024:.0f} MB peak')
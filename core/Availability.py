@@ -1,62 +1,127 @@
-import collections.abc
+import bisect
 import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
 
 import pendulum
-from bs4 import BeautifulSoup
-from icecream import ic
 
-ic.configureOutput(prefix='|> ')
+from core import tracing
+from core.literals import parse_literal, LiteralError
 
+one_day = timedelta(days=1)
 
-def extract_availability(page_contents: str) -> list:
+
+@dataclass
+class AvailabilityCalendar:
+    booked: list[tuple[date, date]] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.booked_starts = [z[0] for z in self.booked]
+
+    def free_windows(self, start: date, end: date) -> list[tuple[date, date]]:
+        windows = []
+        cursor = start
+        index = max(0, bisect.bisect_right(self.booked_starts, start) - 1)
+        for booked_start, booked_end in self.booked[index:]:
+            if booked_start >= end:
+                break
+            if booked_end <= cursor:
+                continue
+            if booked_start > cursor:
+                windows.append((cursor, booked_start))
+            cursor = max(cursor, booked_end)
+        if cursor < end:
+            windows.append((cursor, end))
+        return windows
+
+    def available_dates(self, start: date, end: date) -> list[date]:
+        available = []
+        for window_start, window_end in self.free_windows(start, end):
+            available.extend(window_start + timedelta(days=z) for z in range((window_end - window_start).days))
+        return available
+
+    def is_open(self, arrival: date, departure: date) -> bool:
+        index = bisect.bisect_left(self.booked_starts, departure) - 1
+        if index < 0:
+            return True
+        return self.booked[index][1] <= arrival
+
+    def open_windows(self, start: date, end: date, nights: int, count: int) -> list[tuple[date, date]]:
+        stay = timedelta(days=nights)
+        windows = []
+        for window_start, window_end in self.free_windows(start, end):
+            arrival = window_start
+            while arrival + stay <= window_end and len(windows) < count:
+                windows.append((arrival, arrival + stay))
+                arrival += one_day
+            if len(windows) >= count:
+                break
+        return windows
+
+    def to_dict(self) -> dict:
+        return {"booked": [[z[0].isoformat(), z[1].isoformat()] for z in self.booked]}
+
+    @staticmethod
+    def from_dict(calendar: dict) -> 'AvailabilityCalendar':
+        return AvailabilityCalendar([(date.fromisoformat(z[0]), date.fromisoformat(z[1]))
+                                     for z in calendar.get("booked", [])])
+
+
+booked_dates_pattern = re.compile(rb'(?:const|var|let)\s*bookedDates\s*=\s*', re.IGNORECASE)
+
+
+def extract_availability(page_contents: bytes | str) -> list[AvailabilityCalendar]:
     parsed_results = []
     if page_contents is None or len(page_contents) == 0:
         return parsed_results
+    if isinstance(page_contents, str):
+        page_contents = page_contents.encode()
 
-    match_date_pattern = r'(?:const|var|let)\s*bookedDates\s*=\s*([^.map;]*)'
-
-    soup = BeautifulSoup(page_contents, "html.parser")
-    scripts = soup.find_all("script", {"type": ["text/javascript"]})
-    for script in scripts:
-        replacements = {'\r': '', '\n': ''}
-        script_text = re.sub('|'.join(replacements.keys()), lambda z: replacements[z.group(0)], script.get_text())
-        match = re.search(match_date_pattern, script_text, re.IGNORECASE | re.MULTILINE)
-        if match is None:
+    for match in booked_dates_pattern.finditer(page_contents):
+        if page_contents[match.end():match.end() + 1] != b'[':
+            continue
+        try:
+            booked_dates, _ = parse_literal(page_contents, match.end())
+        except LiteralError as error:
+            tracing.error("extract_availability", error)
             continue
-        replace_syntax = {'const': '', 'let': '', 'var': '', 'bookedDates': '', '=': ''}
-        dates_only = re.sub('|'.join(replace_syntax.keys()), lambda z: replace_syntax[z.group(0)], match.groups()[0], re.IGNORECASE)
-        availability_params = ic(dates_only.strip())
-        parsed_results.append(compute_availability(availability_params))
+        parsed_results.append(compute_availability(booked_dates))
 
     return parsed_results
 
 
-def compute_availability(availability_params):
-    unavailable_dates = get_unavailable_dates(availability_params)
-    available_dates = []
-    start_date = pendulum.now('UTC').date()
-    end_date = pendulum.now('UTC').add(years=2).date()
-    date_interval = pendulum.interval(start_date, end_date)
-    for date in date_interval:
-        if date in unavailable_dates:
+def compute_availability(booked_dates: list) -> AvailabilityCalendar:
+    return AvailabilityCalendar(get_booked_intervals(booked_dates))
+
+
+def merge_intervals(intervals: list[tuple[date, date]]) -> list[tuple[date, date]]:
+    merged = []
+    for start, end in sorted(intervals):
+        if len(merged) > 0 and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
             continue
-        available_dates.append(date)
-    return available_dates
+        merged.append((start, end))
+    return merged
+
+
+def parse_booked_date(booked_date: str) -> date:
+    try:
+        return date.fromisoformat(booked_date[:10])
+    except ValueError:
+        return pendulum.parse(booked_date).date()
 
 
-def get_unavailable_dates(availability_params):
-    unavailable_dates = []
+def get_booked_intervals(booked_dates: list) -> list[tuple[date, date]]:
+    booked_intervals = []
     try:
-        for date_segment in eval(availability_params):
-            if isinstance(date_segment, collections.abc.Iterable):
-                end_date = ic(pendulum.parse(date_segment.pop()))
-                start_date = ic(pendulum.parse(date_segment.pop()))
-                date_interval = pendulum.interval(start_date, end_date)
-                for date in date_interval:
-                    unavailable_dates.append(date.date())
+        for date_segment in booked_dates:
+            if isinstance(date_segment, list):
+                end_date = parse_booked_date(date_segment[-1])
+                start_date = parse_booked_date(date_segment[-2])
+                booked_intervals.append((start_date, end_date + one_day))
                 continue
-            unavailable_dates.append(pendulum.parse(date_segment).date())
+            booked_date = parse_booked_date(date_segment)
+            booked_intervals.append((booked_date, booked_date + one_day))
     except Exception as error:
-        ic(error)
-    results = list(dict.fromkeys(unavailable_dates))
-    return results
+        tracing.error("get_booked_intervals", error)
+    return merge_intervals(booked_intervals)
@@ -1,13 +1,21 @@
+import asyncio
+import random
 import re
 from dataclasses import dataclass, field
 from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
-from icecream import ic
+from core import settings, tracing
+from core.agents import user_agent_list
+from core.executor import extractors
+from core.http_client import http_client
+from core.loading import LoadTarget, load_page
+from core.metrics import stage_timer
+from core.parsing import ParsedPage, parse_page
 
-ic.configureOutput(prefix='|> ')
-
-wait_action = 'networkidle'
+property_listing_target = LoadTarget(selector=".property-result-tile, .property-result-list")
+listing_classes = ["property-result-tile", "property-result-list"]
+pager_classes = ["result-page", *listing_classes]
+first_page_id = 1
 
 
 @dataclass
@@ -31,23 +39,38 @@ def parse_property_link(extracted_property_link: str, base_url: str):
     return extracted_property_link
 
 
-async def extract_from_tiles(property_page_tiles, base_url: str) -> list[Property]:
+def extract_from_tiles(property_page_tiles, base_url: str) -> list[Property]:
     tile_properties = []
     for property_page_tile in property_page_tiles:
-        extracted = await extract_property_details_from_tiles(base_url, property_page_tile)
+        extracted = extract_property_details_from_tiles(base_url, property_page_tile)
         tile_properties.append(extracted)
 
     return tile_properties
 
 
-async def extract_property_details_from_tiles(base_url, property_page_tile):
-    title = property_page_tile.select('span.h3.media-heading').pop().text
-    extracted = Property(title)
+def extract_property_details_from_tiles(base_url, property_page_tile):
+    heading = None
+    image = None
+    caption = None
+    amenities = []
+    for element in property_page_tile.find_all(True):
+        classes = element.get("class", [])
+        if element.name == "img" and image is None:
+            image = element
+        if element.name != "span":
+            continue
+        if "h3" in classes and "media-heading" in classes:
+            heading = element
+        if "amenity-list-item" in classes:
+            amenities.append(element.get("data-original-title"))
+        if "caption" in classes and caption is None:
+            caption = element
+
+    extracted = Property(heading.text)
     extracted.property_url = parse_property_link(property_page_tile.get("href"), base_url.removesuffix("/properties"))
-    extracted.photo_url = property_page_tile.find("img").get("src")
-    extracted.amenities = [z.get("data-original-title") for z in
-                           property_page_tile.find_all("span", {"class": ["amenity-list-item"]})]
-    details_line = property_page_tile.find("span", {"class": ["caption"]}).text.strip()
+    extracted.photo_url = image.get("src")
+    extracted.amenities = amenities
+    details_line = caption.text.strip()
     numbers = re.findall(r'\d+', details_line)
     values = list(map(int, numbers))
     extracted.sleeps = values[0]
@@ -88,7 +111,7 @@ def extract_size(size_div) -> dict[str, str]:
     return elements_text
 
 
-async def extract_from_list(property_page_list, base_url) -> list[Property]:
+def extract_from_list(property_page_list, base_url) -> list[Property]:
     list_properties = []
     if len(property_page_list) == 0:
         return list_properties
@@ -98,12 +121,12 @@ async def extract_from_list(property_page_list, base_url) -> list[Property]:
         sections = property_list_row.find_all("div")
         if len(sections) == 0:
             continue
-        extracted = await extract_property_details_from_list(base_url, sections)
+        extracted = extract_property_details_from_list(base_url, sections)
         list_properties.append(extracted)
     return list_properties
 
 
-async def extract_property_details_from_list(base_url, sections) -> Property:
+def extract_property_details_from_list(base_url, sections) -> Property:
     extracted = Property()
     link_section = sections[0]
     description_section = sections[1]
@@ -127,38 +150,72 @@ async def extract_property_details_from_list(base_url, sections) -> Property:
     return extracted
 
 
+def parse_properties(page_contents, base_url: str) -> list[Property]:
+    parsed_page = parse_page(page_contents, listing_classes, "properties")
+    return extract_properties_from_page(parsed_page, base_url)
+
+
+def parse_listing_page(page_contents, base_url: str) -> tuple[list[int], list[Property]]:
+    parsed_page = parse_page(page_contents, pager_classes, "properties")
+    property_pager_links = parsed_page.select_class("result-page", "a")
+    first_page_properties = extract_properties_from_page(parsed_page, base_url)
+    if len(property_pager_links) == 0:
+        return [], first_page_properties
+    # The listing loaded without ?page= is page 1, so only the remaining pages need fetching
+    remaining_page_ids = set(parsed_property_ids(property_pager_links)) - {0, first_page_id}
+    return sorted(remaining_page_ids), first_page_properties
+
+
 async def extract_properties(page_contents, base_url: str) -> list[Property]:
+    return await extractors.run(parse_properties, page_contents, base_url)
+
+
+def extract_properties_from_page(parsed_page: ParsedPage, base_url: str) -> list[Property]:
     extracted_properties = []
-    soup = BeautifulSoup(page_contents, "html.parser")
-    property_page_tiles = soup.find_all("a", {"class": ["property-result-tile"]})
-    tile_properties = await extract_from_tiles(property_page_tiles, base_url)
+    property_page_tiles = parsed_page.select_class("property-result-tile", "a")
+    tile_properties = extract_from_tiles(property_page_tiles, base_url)
     if len(tile_properties) > 0:
         extracted_properties.extend(tile_properties)
-    property_page_list = soup.find_all("div", {"class": ["property-result-list"]})
-    list_properties = await extract_from_list(property_page_list, base_url)
+    property_page_list = parsed_page.select_class("property-result-list", "div")
+    list_properties = extract_from_list(property_page_list, base_url)
     if len(list_properties) > 0:
         extracted_properties.extend(list_properties)
         return extracted_properties
     return extracted_properties
 
 
+async def fetch_listing_page(context, url_to_visit: str, limiter: asyncio.Semaphore) -> str:
+    async with limiter:
+        if settings.listing_fetch == "http":
+            headers = {"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]}
+            response = await http_client.get(url_to_visit, headers=headers, follow_redirects=True)
+            response.raise_for_status()
+            return response.text
+        listing_page = await context.new_page()
+        try:
+            await load_page(listing_page, url_to_visit, property_listing_target)
+            with stage_timer("content", url_to_visit):
+                return await listing_page.content()
+        finally:
+            await listing_page.close()
+
+
 async def extract_paged_properties(page, base_url: str) -> list[Property]:
     properties = []
-    page_contents = await page.content()
-    soup = BeautifulSoup(page_contents, "html.parser")
-    property_pager_links = soup.find_all("a", {"class": ["result-page"]})
-    if len(property_pager_links) == 0:
-        properties.extend(await extract_properties(page_contents, base_url))
+    with stage_timer("content", base_url):
+        page_contents = await page.content()
+    with stage_timer("extract", base_url):
+        page_ids, first_page_properties = await extractors.run(parse_listing_page, page_contents, base_url)
+    properties.extend(first_page_properties)
+    if len(page_ids) == 0:
         return properties
 
-    for page_id in set(parsed_property_ids(property_pager_links)):
-        if page_id == 0:
-            continue
-        url_to_visit = f'{base_url}?page={page_id}'
-        await page.goto(url_to_visit)
-        await page.wait_for_load_state(wait_action)
-        page_contents = await page.content()
-        properties.extend(await extract_properties(page_contents, base_url))
+    limiter = asyncio.Semaphore(max(1, settings.listing_page_concurrency))
+    paged_contents = await asyncio.gather(*[fetch_listing_page(page.context, f'{base_url}?page={z}', limiter)
+                                            for z in page_ids])
+    for page_contents in paged_contents:
+        with stage_timer("extract", base_url):
+            properties.extend(await extract_properties(page_contents, base_url))
     return properties
 
 
@@ -168,5 +225,5 @@ def parsed_property_ids(property_pager_links) -> list[int]:
         try:
             link_ids.append(int(link_id))
         except ValueError:
-            ic(f"{link_id} not an integer")
+            tracing.warning("listing_page_id", link_id=link_id)
     return link_ids
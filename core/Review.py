@@ -1,12 +1,17 @@
+import hashlib
+import json
 import urllib
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 import re
+from datetime import date, datetime
 from urllib.parse import urlencode, urlparse
 
-from bs4 import BeautifulSoup
-from icecream import ic
+from dateutil import parser as date_parser
 
-ic.configureOutput(prefix='|> ')
+from core import tracing
+from core.parsing import make_soup, class_strainer
+
+review_pager_strainer = class_strainer("reviews-pager")
 
 
 @dataclass
@@ -28,6 +33,20 @@ class Review:
     response: str = None
     stars: int = 0
 
+    @property
+    def content_hash(self) -> str:
+        identity = {key: value for key, value in asdict(self).items() if key != "response"}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    @property
+    def review_date(self) -> date | None:
+        if self.date_line is None or self.date_line == "":
+            return None
+        try:
+            return date_parser.parse(self.date_line, default=datetime(2000, 1, 1)).date()
+        except (ValueError, OverflowError):
+            return None
+
 
 def extract_partial_links(paged_reviews) -> list[str]:
     partial_links = []
@@ -45,7 +64,7 @@ def build_url(base_url: str, review_params: ReviewUrlParameters, page_index: int
 
 def extract_review_page_links(iframe_content: str, base_url: str) -> list[str]:
     review_paged_links = []
-    soup = BeautifulSoup(iframe_content, "html.parser")
+    soup = make_soup(iframe_content, review_pager_strainer, "review_pager")
     review_pager = soup.find_all("div", {"class": ["reviews-pager"]})
     if len(review_pager) == 0:
         return review_paged_links
@@ -135,5 +154,5 @@ def parse_review(review_html) -> Review:
         if content_items is not None:
             review_data.content, review_data.response = extract_from_content_line(content_items)
     except Exception as e:
-        ic(e)
+        tracing.error("parse_review", e)
     return review_data
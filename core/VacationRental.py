@@ -1,19 +1,25 @@
 import json
 
 from async_lru import alru_cache
-from bs4 import BeautifulSoup
-from icecream import ic
+from bs4 import SoupStrainer
 
-ic.configureOutput(prefix='|> ')
+from core.executor import extractors
+from core.parsing import make_soup
+
+json_ld_strainer = SoupStrainer("script", {"type": ["application/ld+json"]})
 
 
 @alru_cache(ttl=3600)
 async def extract_vacation_rental(page_contents: str) -> list[dict]:
+    return await extractors.run(parse_vacation_rental, page_contents)
+
+
+def parse_vacation_rental(page_contents: str) -> list[dict]:
     parsed_results = []
     if page_contents is None or len(page_contents) == 0:
         return parsed_results
 
-    soup = BeautifulSoup(page_contents, "html.parser")
+    soup = make_soup(page_contents, json_ld_strainer, "vacation_rental")
     json_lds = soup.find_all("script", {"type": ["application/ld+json"]})
     parsed_results = []
     for json_ld in json_lds:
@@ -0,0 +1,201 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass, field
+
+from core import settings, tracing
+from core.metrics import admission_decisions, admission_in_use, admission_waiting, admission_wait_seconds
+
+background_priority = 9
+background_work = contextvars.ContextVar("background_work", default=False)
+
+endpoint_budgets = {
+    "get_availability": ("http", 0),
+    "get_price": ("price", 1),
+    "retrieve_price": ("price", 1),
+    "get_price_matrix": ("price", 2),
+    "price_browser_fallback": ("browser", 1),
+    "retrieve_reviews": ("browser", 3),
+    "retrieve_properties": ("browser", 3),
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, budget: str, retry_after: int, reason: str):
+        super().__init__(f'{budget} capacity is saturated ({reason}), retry after {retry_after} seconds')
+        self.status_code = status_code
+        self.budget = budget
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+@dataclass(order=True)
+class Waiter:
+    priority: int
+    sequence: int
+    endpoint: str = field(compare=False)
+    future: asyncio.Future = field(compare=False, repr=False)
+
+
+class Budget:
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self.queue: list[Waiter] = []
+        self.waiting = 0
+        self.sequence = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.evicted = 0
+        self.served = 0
+        self.service_seconds = 0.0
+
+    def retry_after(self) -> int:
+        average_seconds = self.service_seconds / self.served if self.served > 0 else 1.0
+        return max(1, math.ceil(average_seconds * (self.waiting + 1) / self.limit))
+
+    def reject(self, status_code: int, endpoint: str, reason: str) -> AdmissionRejected:
+        admission_decisions.labels(self.name, endpoint, reason).inc()
+        tracing.warning("admission_rejected", budget=self.name, endpoint=endpoint, reason=reason,
+                        in_use=self.in_use, waiting=self.waiting)
+        return AdmissionRejected(status_code, self.name, self.retry_after(), reason)
+
+    async def acquire(self, endpoint: str, priority: int):
+        if self.in_use < self.limit and self.waiting == 0:
+            self.take(endpoint, "admitted")
+            return
+
+        if self.waiting >= self.queue_size:
+            worst = max((z for z in self.queue if not z.future.done()), default=None)
+            if worst is None or worst.priority <= priority:
+                self.rejected += 1
+                raise self.reject(429, endpoint, "queue_full")
+            self.evicted += 1
+            self.dequeue()
+            worst.future.set_exception(self.reject(503, worst.endpoint, "evicted"))
+
+        waiter = Waiter(priority, next(self.sequence), endpoint, asyncio.get_running_loop().create_future())
+        heapq.heappush(self.queue, waiter)
+        self.waiting += 1
+        self.queued += 1
+        admission_waiting.labels(self.name).inc()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self.handed_over(waiter):
+                return
+            self.dequeue()
+            waiter.future.cancel()
+            self.timed_out += 1
+            raise self.reject(503, endpoint, "deadline") from None
+        except asyncio.CancelledError:
+            if self.handed_over(waiter):
+                self.release(0.0)
+            elif not waiter.future.done():
+                self.dequeue()
+                waiter.future.cancel()
+            raise
+        finally:
+            admission_wait_seconds.labels(self.name).observe(time.perf_counter() - started)
+
+    @staticmethod
+    def handed_over(waiter: Waiter) -> bool:
+        return waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None
+
+    def dequeue(self):
+        self.waiting -= 1
+        admission_waiting.labels(self.name).dec()
+
+    def take(self, endpoint: str, result: str):
+        self.in_use += 1
+        self.admitted += 1
+        admission_in_use.labels(self.name).inc()
+        admission_decisions.labels(self.name, endpoint, result).inc()
+
+    def release(self, seconds: float):
+        self.in_use -= 1
+        self.served += 1
+        self.service_seconds += seconds
+        admission_in_use.labels(self.name).dec()
+        while len(self.queue) > 0 and self.in_use < self.limit:
+            waiter = heapq.heappop(self.queue)
+            if waiter.future.done():
+                continue
+            self.dequeue()
+            self.take(waiter.endpoint, "dequeued")
+            waiter.future.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "evicted": self.evicted,
+            "average_seconds": self.service_seconds / self.served if self.served > 0 else None,
+        }
+
+
+class AdmissionController:
+    def __init__(self, budgets: dict[str, Budget], price_budget: str, enabled: bool):
+        self.budgets = budgets
+        self.price_budget = price_budget
+        self.enabled = enabled
+
+    def budget(self, endpoint: str) -> tuple[Budget | None, int]:
+        budget_name, priority = endpoint_budgets.get(endpoint, (None, 0))
+        if budget_name == "price":
+            budget_name = self.price_budget
+        return self.budgets.get(budget_name), priority
+
+    @asynccontextmanager
+    async def admit(self, endpoint: str, background: bool = False):
+        budget, priority = self.budget(endpoint)
+        if not self.enabled or budget is None:
+            yield
+            return
+        background = background or background_work.get()
+        await budget.acquire(endpoint, background_priority if background else priority)
+        started = time.perf_counter()
+        background_token = background_work.set(background)
+        try:
+            yield
+        finally:
+            background_work.reset(background_token)
+            budget.release(time.perf_counter() - started)
+
+    def browser_fallback(self):
+        # Prices admitted on the http budget still need a browser slot when they fall back to the browser
+        if self.price_budget == "browser":
+            return nullcontext()
+        return self.admit("price_browser_fallback")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "price_budget": self.price_budget,
+            "budgets": {name: budget.stats() for name, budget in self.budgets.items()},
+        }
+
+
+admission = AdmissionController({
+    "browser": Budget("browser",
+                      settings.admission_browser_limit or settings.browser_pool_size * settings.browser_pool_max_contexts,
+                      settings.admission_queue_size, settings.admission_queue_timeout),
+    "http": Budget("http", settings.admission_http_limit or settings.http_max_per_host,
+                   settings.admission_queue_size, settings.admission_queue_timeout),
+}, "http" if settings.price_http_tier else "browser", settings.admission_control)
@@ -0,0 +1,144 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from playwright.async_api import async_playwright, Browser
+
+from core import settings, tracing
+from core.metrics import stage_timer, browsers_connected, browser_contexts_in_use, browser_contexts_waiting
+
+
+class BrowserPoolTimeout(Exception):
+    pass
+
+
+@dataclass
+class BrowserSlot:
+    index: int
+    browser: Browser = None
+    active_contexts: int = 0
+    launches: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+
+class BrowserPool:
+    def __init__(self, size: int, max_contexts: int, acquire_timeout: float):
+        self.size = max(1, size)
+        self.max_contexts = max(1, max_contexts)
+        self.acquire_timeout = acquire_timeout
+        self.slots = [BrowserSlot(index) for index in range(self.size)]
+        self.waiting = 0
+        self._playwright = None
+        self._condition = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        async with self._start_lock:
+            if self.started:
+                return
+            self._playwright = await async_playwright().start()
+            for slot in self.slots:
+                await self._launch(slot)
+            tracing.info("browser_pool_started", browsers=self.size)
+
+    async def stop(self):
+        async with self._start_lock:
+            if not self.started:
+                return
+            for slot in self.slots:
+                if slot.browser is not None:
+                    await slot.browser.close()
+                    slot.browser = None
+            browsers_connected.set(0)
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self, slot: BrowserSlot):
+        slot.browser = await self._playwright.chromium.launch(headless=True)
+        slot.launches += 1
+        browsers_connected.set(len([z for z in self.slots if z.browser is not None and z.browser.is_connected()]))
+
+    async def _connected_browser(self, slot: BrowserSlot) -> Browser:
+        async with slot.lock:
+            if slot.browser is not None and slot.browser.is_connected():
+                return slot.browser
+            if slot.browser is not None:
+                stale_browser, slot.browser = slot.browser, None
+                try:
+                    await stale_browser.close()
+                except Exception as error:
+                    tracing.warning("browser_close", slot=slot.index, error=error.__class__.__name__)
+            await self._launch(slot)
+            tracing.info("browser_relaunched", slot=slot.index, launches=slot.launches)
+            return slot.browser
+
+    def _free_slot(self) -> BrowserSlot | None:
+        available = [z for z in self.slots if z.active_contexts < self.max_contexts]
+        if len(available) == 0:
+            return None
+        return min(available, key=lambda z: z.active_contexts)
+
+    async def _acquire(self) -> BrowserSlot:
+        async with self._condition:
+            self.waiting += 1
+            browser_contexts_waiting.inc()
+            try:
+                await asyncio.wait_for(self._condition.wait_for(lambda: self._free_slot() is not None),
+                                       self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise BrowserPoolTimeout(f'No browser context available after {self.acquire_timeout}s')
+            finally:
+                self.waiting -= 1
+                browser_contexts_waiting.dec()
+            slot = self._free_slot()
+            slot.active_contexts += 1
+            browser_contexts_in_use.inc()
+            return slot
+
+    async def _release(self, slot: BrowserSlot):
+        async with self._condition:
+            slot.active_contexts -= 1
+            browser_contexts_in_use.dec()
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        if not self.started:
+            await self.start()
+        with stage_timer("acquire", ""):
+            slot = await self._acquire()
+        try:
+            with stage_timer("context", ""):
+                browser = await self._connected_browser(slot)
+                browser_context = await browser.new_context(**context_options)
+            try:
+                yield browser_context
+            finally:
+                await browser_context.close()
+        finally:
+            await self._release(slot)
+
+    def stats(self) -> dict:
+        in_use = sum(z.active_contexts for z in self.slots)
+        capacity = self.size * self.max_contexts
+        return {
+            "browsers": self.size,
+            "max_contexts_per_browser": self.max_contexts,
+            "capacity": capacity,
+            "in_use": in_use,
+            "available": capacity - in_use,
+            "waiting": self.waiting,
+            "slots": [{"index": z.index,
+                       "connected": z.browser is not None and z.browser.is_connected(),
+                       "active_contexts": z.active_contexts,
+                       "launches": z.launches} for z in self.slots],
+        }
+
+
+browser_pool = BrowserPool(settings.browser_pool_size,
+                           settings.browser_pool_max_contexts,
+                           settings.browser_pool_acquire_timeout)
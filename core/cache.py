@@ -0,0 +1,79 @@
+import hashlib
+import json
+import time
+from collections import Counter
+
+from core import settings
+from core.metrics import record_cache
+from core.store import SharedStore
+
+purge_interval = 100
+
+
+class ResponseCache:
+    def __init__(self, store: SharedStore, ttls: dict[str, int], stale_window: int, enabled: bool):
+        self.store = store
+        self.ttls = ttls
+        self.stale_window = max(0, stale_window)
+        self.enabled = enabled
+        self.hits = Counter()
+        self.stale_hits = Counter()
+        self.misses = Counter()
+        self.writes = 0
+
+    @staticmethod
+    def key(endpoint: str, params: dict) -> str:
+        normalized = json.dumps({"endpoint": endpoint, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, endpoint: str, params: dict):
+        cached = self.lookup(endpoint, params, allow_stale=False)
+        return None if cached is None else cached[0]
+
+    def lookup(self, endpoint: str, params: dict, allow_stale: bool = True) -> tuple[object, bool] | None:
+        if not self.enabled or self.ttls.get(endpoint, 0) <= 0:
+            return None
+        stale_window = self.stale_window if allow_stale else 0
+        stored = self.store.get(self.key(endpoint, params), include_expired=stale_window > 0)
+        if stored is None or stored.expires_at + stale_window <= time.time():
+            self.misses[endpoint] += 1
+            record_cache(f'response:{endpoint}', "miss")
+            return None
+        if stored.expired:
+            self.stale_hits[endpoint] += 1
+            record_cache(f'response:{endpoint}', "stale")
+        else:
+            self.hits[endpoint] += 1
+            record_cache(f'response:{endpoint}', "hit")
+        return json.loads(stored.value), stored.expired
+
+    def set(self, endpoint: str, params: dict, value):
+        ttl = self.ttls.get(endpoint, 0)
+        if not self.enabled or ttl <= 0:
+            return
+        self.store.set(self.key(endpoint, params), json.dumps(value), ttl)
+        self.writes += 1
+        if self.writes % purge_interval == 0:
+            self.store.purge(self.stale_window)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.store.path,
+            "ttls": self.ttls,
+            "stale_window": self.stale_window,
+            "hits": dict(self.hits),
+            "stale_hits": dict(self.stale_hits),
+            "misses": dict(self.misses),
+        }
+
+
+response_cache = ResponseCache(SharedStore(settings.shared_cache_path, "responses"), {
+    "get_availability": settings.cache_ttl_availability,
+    "get_price": settings.cache_ttl_price,
+    "retrieve_price": settings.cache_ttl_price,
+    "retrieve_reviews": settings.cache_ttl_reviews,
+    "retrieve_properties": settings.cache_ttl_properties,
+    "price_cell": settings.cache_ttl_price_cell,
+    "price_property": settings.cache_ttl_price_cell,
+}, settings.cache_stale_window, settings.response_cache_enabled)
@@ -0,0 +1,56 @@
+import asyncio
+
+
+class CorrelationRegistryFull(Exception):
+    pass
+
+
+class CorrelationRegistry:
+    def __init__(self, max_pending: int):
+        self.max_pending = max(1, max_pending)
+        self.pending: dict[str, asyncio.Future] = {}
+        self.resolved = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def register(self, request_id: str) -> asyncio.Future:
+        if len(self.pending) >= self.max_pending:
+            self.rejected += 1
+            raise CorrelationRegistryFull(f'{len(self.pending)} requests already waiting on a response')
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        return future
+
+    def resolve(self, request_id: str, value) -> bool:
+        future = self.pending.get(request_id)
+        if future is None or future.done():
+            return False
+        future.set_result(value)
+        self.resolved += 1
+        return True
+
+    def discard(self, request_id: str):
+        future = self.pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def wait(self, request_id: str, timeout: float):
+        future = self.pending.get(request_id)
+        if future is None:
+            return None
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+        finally:
+            self.discard(request_id)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "max_pending": self.max_pending,
+            "resolved": self.resolved,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from core import settings
+
+
+class ExtractorExecutor:
+    def __init__(self, mode: str, workers: int):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.executor: Executor = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.timings = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+
+    def start(self):
+        if self.executor is not None:
+            return
+        if self.mode == "process":
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        elif self.mode == "thread":
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="extractor")
+
+    def stop(self):
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+
+    async def run(self, extractor, *args):
+        if self.mode in ["process", "thread"] and self.executor is None:
+            self.start()
+        started = time.perf_counter()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.executor is None:
+                return extractor(*args)
+            if self.mode == "thread":
+                extractor_call = functools.partial(contextvars.copy_context().run, extractor, *args)
+                return await asyncio.get_running_loop().run_in_executor(self.executor, extractor_call)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, extractor, *args)
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            timing = self.timings[extractor.__name__]
+            timing["calls"] += 1
+            timing["seconds"] += elapsed
+            timing["max_seconds"] = max(timing["max_seconds"], elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_depth": self.in_flight,
+            "max_queue_depth": self.max_in_flight,
+            "extractors": {name: {**timing, "average_seconds": timing["seconds"] / timing["calls"]}
+                           for name, timing in self.timings.items() if timing["calls"] > 0},
+        }
+
+
+extractors = ExtractorExecutor(settings.extractor_executor, settings.extractor_workers)
@@ -0,0 +1,78 @@
+import asyncio
+from collections import Counter
+from urllib.parse import urlparse
+
+import httpx
+
+from core import settings
+from core.metrics import stage_timer, record_status
+
+
+class HttpClientPool:
+    def __init__(self, max_connections: int, max_keepalive: int, keepalive_expiry: float, max_per_host: int,
+                 timeout: float, connect_timeout: float, http2: bool):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_per_host = max(1, max_per_host)
+        self.http2 = http2
+        self.client: httpx.AsyncClient = None
+        self.host_slots: dict[str, asyncio.Semaphore] = {}
+        self.in_flight = Counter()
+        self.requests = 0
+
+    async def start(self):
+        if self.client is not None:
+            return
+        self.client = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=self.timeout)
+
+    async def stop(self):
+        if self.client is None:
+            return
+        await self.client.aclose()
+        self.client = None
+
+    def _host_slot(self, host: str) -> asyncio.Semaphore:
+        if host not in self.host_slots:
+            self.host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self.host_slots[host]
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        if self.client is None:
+            await self.start()
+        host = urlparse(url).hostname or ""
+        async with self._host_slot(host):
+            self.in_flight[host] += 1
+            self.requests += 1
+            try:
+                with stage_timer("http", url):
+                    response = await self.client.get(url, **kwargs)
+                record_status(url, response.status_code)
+                return response
+            finally:
+                self.in_flight[host] -= 1
+
+    def stats(self) -> dict:
+        connections = []
+        if self.client is not None:
+            pool = getattr(self.client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_per_host": self.max_per_host,
+            "requests": self.requests,
+            "connections": len(connections),
+            "idle_connections": len([z for z in connections if z.is_idle()]),
+            "in_flight": {host: count for host, count in self.in_flight.items() if count > 0},
+        }
+
+
+http_client = HttpClientPool(settings.http_max_connections,
+                             settings.http_max_keepalive,
+                             settings.http_keepalive_expiry,
+                             settings.http_max_per_host,
+                             settings.http_timeout,
+                             settings.http_connect_timeout,
+                             settings.http2)
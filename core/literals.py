@@ -0,0 +1,104 @@
+class LiteralError(ValueError):
+    pass
+
+
+whitespace = frozenset(b' \t\r\n')
+number_characters = frozenset(b'+-.0123456789eE')
+hex_digits = frozenset(b'0123456789abcdefABCDEF')
+escapes = {ord('n'): '\n', ord('t'): '\t', ord('r'): '\r', ord('b'): '\b', ord('f'): '\f', ord('0'): '\0'}
+keywords = {b'true': True, b'false': False, b'null': None, b'undefined': None}
+
+
+def skip_whitespace(source: bytes, position: int) -> int:
+    while position < len(source) and source[position] in whitespace:
+        position += 1
+    return position
+
+
+def parse_string(source: bytes, position: int) -> tuple[str, int]:
+    quote = source[position]
+    position += 1
+    pieces = []
+    chunk_start = position
+    while position < len(source):
+        character = source[position]
+        if character == quote:
+            pieces.append(source[chunk_start:position].decode("utf-8", "replace"))
+            return "".join(pieces), position + 1
+        if character == ord('\\'):
+            pieces.append(source[chunk_start:position].decode("utf-8", "replace"))
+            position += 1
+            if position >= len(source):
+                break
+            escaped = source[position]
+            if escaped == ord('u'):
+                digits = source[position + 1:position + 5]
+                if len(digits) != 4 or not hex_digits.issuperset(digits):
+                    raise LiteralError(f'Invalid \\u escape {digits!r} at {position - 1}')
+                pieces.append(chr(int(digits, 16)))
+                position += 5
+            else:
+                pieces.append(escapes.get(escaped, chr(escaped)))
+                position += 1
+            chunk_start = position
+            continue
+        position += 1
+    raise LiteralError('Unterminated string literal')
+
+
+def parse_scalar(source: bytes, position: int) -> tuple[object, int]:
+    for keyword, value in keywords.items():
+        if source.startswith(keyword, position):
+            return value, position + len(keyword)
+    end = position
+    while end < len(source) and source[end] in number_characters:
+        end += 1
+    if end == position:
+        raise LiteralError(f'Unexpected character {chr(source[position])!r} at {position}')
+    text = source[position:end].decode()
+    try:
+        return (float(text) if any(z in text for z in '.eE') else int(text)), end
+    except ValueError:
+        raise LiteralError(f'Invalid number {text!r} at {position}')
+
+
+def parse_literal(source: bytes, position: int = 0) -> tuple[object, int]:
+    stack = []
+    while True:
+        position = skip_whitespace(source, position)
+        if position >= len(source):
+            raise LiteralError('Unexpected end of input')
+        character = source[position]
+        if character == ord('['):
+            stack.append([])
+            position += 1
+            position = skip_whitespace(source, position)
+            if position < len(source) and source[position] == ord(']'):
+                value = stack.pop()
+                position += 1
+            else:
+                continue
+        elif character in (ord('"'), ord("'")):
+            value, position = parse_string(source, position)
+        else:
+            value, position = parse_scalar(source, position)
+
+        while True:
+            if len(stack) == 0:
+                return value, position
+            stack[-1].append(value)
+            position = skip_whitespace(source, position)
+            if position >= len(source):
+                raise LiteralError('Unterminated array literal')
+            if source[position] == ord(','):
+                position = skip_whitespace(source, position + 1)
+                if position < len(source) and source[position] == ord(']'):
+                    value = stack.pop()
+                    position += 1
+                    continue
+                break
+            if source[position] == ord(']'):
+                value = stack.pop()
+                position += 1
+                continue
+            raise LiteralError(f'Expected , or ] at {position}')
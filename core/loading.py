@@ -0,0 +1,80 @@
+import asyncio
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from playwright.async_api import Page, BrowserContext, Route, TimeoutError as PlaywrightTimeoutError
+
+from core import settings, tracing
+from core.metrics import stage_timer
+
+wait_action = 'networkidle'
+blocked_resource_types = ["image", "media", "font"]
+
+
+@dataclass
+class LoadTarget:
+    selector: str = None
+    response_prefix: str = None
+    frame_prefix: str = None
+
+
+def is_first_party(url: str, first_party_hosts: list[str]) -> bool:
+    host = urlparse(url).hostname
+    if host is None:
+        return True
+    return any(host == z or host.endswith(f'.{z}') for z in first_party_hosts)
+
+
+async def block_resources(context: BrowserContext, target_url: str):
+    if not settings.fast_load:
+        return
+    first_party_hosts = [urlparse(target_url).hostname, *settings.fast_load_allowed_hosts]
+
+    async def handle_route(route: Route):
+        request = route.request
+        if request.resource_type in blocked_resource_types or not is_first_party(request.url, first_party_hosts):
+            await route.abort()
+            return
+        await route.continue_()
+
+    await context.route("**/*", handle_route)
+
+
+async def wait_for_target(page: Page, target: LoadTarget, timeout: float):
+    if target.frame_prefix is not None:
+        iframe = await page.wait_for_selector(f'iframe[src^="{target.frame_prefix}"]', timeout=timeout)
+        frame = await iframe.content_frame()
+        if target.selector is not None:
+            await frame.wait_for_selector(target.selector, timeout=timeout)
+        return
+    if target.selector is not None:
+        await page.wait_for_selector(target.selector, timeout=timeout)
+
+
+async def load_page(page: Page, target_url: str, target: LoadTarget):
+    if not settings.fast_load or target is None:
+        with stage_timer("goto", target_url):
+            await page.goto(target_url)
+        with stage_timer("wait", target_url):
+            await page.wait_for_load_state(wait_action)
+        return
+
+    timeout = settings.fast_load_timeout * 1000
+    response_waiter = None
+    if target.response_prefix is not None:
+        response_waiter = asyncio.ensure_future(
+            page.wait_for_event("response", lambda z: z.url.startswith(target.response_prefix), timeout=timeout))
+    try:
+        with stage_timer("goto", target_url):
+            await page.goto(target_url, wait_until="domcontentloaded")
+        with stage_timer("wait", target_url):
+            if response_waiter is not None:
+                await response_waiter
+            await wait_for_target(page, target, timeout)
+    except PlaywrightTimeoutError:
+        tracing.info("fast_load_fallback", target_url=target_url, wait_action=wait_action)
+        with stage_timer("wait", target_url):
+            await page.wait_for_load_state(wait_action)
+    finally:
+        if response_waiter is not None and not response_waiter.done():
+            response_waiter.cancel()
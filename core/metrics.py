@@ -0,0 +1,94 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+multiprocess_directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if multiprocess_directory:
+    os.makedirs(multiprocess_directory, exist_ok=True)
+
+from core.tracing import span
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+
+endpoint_label = contextvars.ContextVar("endpoint_label", default="background")
+
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+request_seconds = Histogram("headless_request_seconds", "Request latency",
+                            ["endpoint", "method", "status"], buckets=latency_buckets)
+requests_in_flight = Gauge("headless_requests_in_flight", "Requests being served",
+                           ["endpoint"], multiprocess_mode="livesum")
+stage_seconds = Histogram("headless_scrape_stage_seconds", "Scrape stage latency",
+                          ["endpoint", "host", "stage"], buckets=latency_buckets)
+parse_seconds = Histogram("headless_parse_seconds", "BeautifulSoup parse latency",
+                          ["endpoint", "kind"], buckets=latency_buckets)
+cache_requests = Counter("headless_cache_requests", "Cache lookups",
+                         ["cache", "endpoint", "result"])
+upstream_errors = Counter("headless_upstream_errors", "Failed upstream fetches and scrape stages",
+                          ["endpoint", "host", "stage", "error"])
+browsers_connected = Gauge("headless_browsers_connected", "Connected browsers",
+                           multiprocess_mode="livesum")
+browser_contexts_in_use = Gauge("headless_browser_contexts_in_use", "Browser contexts handed out",
+                                multiprocess_mode="livesum")
+browser_contexts_waiting = Gauge("headless_browser_contexts_waiting", "Requests waiting on a browser context",
+                                 multiprocess_mode="livesum")
+admission_decisions = Counter("headless_admission_decisions", "Admission decisions by budget",
+                              ["budget", "endpoint", "result"])
+admission_in_use = Gauge("headless_admission_in_use", "Admitted requests holding a budget slot",
+                         ["budget"], multiprocess_mode="livesum")
+admission_waiting = Gauge("headless_admission_waiting", "Requests queued for a budget slot",
+                          ["budget"], multiprocess_mode="livesum")
+admission_wait_seconds = Histogram("headless_admission_wait_seconds", "Time spent queued for a budget slot",
+                                   ["budget"], buckets=latency_buckets)
+
+alru_seen: dict[str, tuple[int, int]] = {}
+
+
+def host_of(url: str) -> str:
+    try:
+        return urlparse(url).hostname or ""
+    except ValueError:
+        return ""
+
+
+@contextmanager
+def stage_timer(stage: str, url: str):
+    endpoint = endpoint_label.get()
+    host = host_of(url)
+    started = time.perf_counter()
+    try:
+        with span(stage, host=host):
+            yield
+    except Exception as error:
+        upstream_errors.labels(endpoint, host, stage, error.__class__.__name__).inc()
+        raise
+    finally:
+        stage_seconds.labels(endpoint, host, stage).observe(time.perf_counter() - started)
+
+
+def record_status(url: str, status_code: int):
+    if status_code >= 400:
+        upstream_errors.labels(endpoint_label.get(), host_of(url), "http", f"HTTP {status_code}").inc()
+
+
+def record_cache(cache: str, result: str):
+    cache_requests.labels(cache, endpoint_label.get(), result).inc()
+
+
+def record_alru(cache: str, function):
+    info = function.cache_info()
+    hits, misses = alru_seen.get(cache, (0, 0))
+    if info.hits > hits:
+        cache_requests.labels(cache, endpoint_label.get(), "hit").inc(info.hits - hits)
+    if info.misses > misses:
+        cache_requests.labels(cache, endpoint_label.get(), "miss").inc(info.misses - misses)
+    alru_seen[cache] = (info.hits, info.misses)
+
+
+def render_metrics() -> bytes:
+    if not multiprocess_directory:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
@@ -0,0 +1,65 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from core import settings
+from core.metrics import endpoint_label, parse_seconds as parse_histogram
+
+parse_stats = defaultdict(lambda: {"pages": 0, "seconds": 0.0, "max_seconds": 0.0})
+
+
+@dataclass
+class ParsedPage:
+    soup: BeautifulSoup
+    parse_seconds: float = 0.0
+    elements: dict[str, list] = field(default_factory=dict)
+
+    def select_class(self, class_name: str, tag_name: str = None) -> list:
+        return [z for z in self.elements.get(class_name, []) if tag_name is None or z.name == tag_name]
+
+    def first_class(self, class_name: str, tag_name: str = None):
+        matches = self.select_class(class_name, tag_name)
+        return matches[0] if len(matches) > 0 else None
+
+
+def class_strainer(*class_names: str) -> SoupStrainer:
+    wanted = set(class_names)
+
+    def has_class(class_value) -> bool:
+        if class_value is None:
+            return False
+        return not wanted.isdisjoint(class_value.split() if isinstance(class_value, str) else class_value)
+
+    return SoupStrainer(class_=has_class)
+
+
+def make_soup(page_contents, parse_only: SoupStrainer = None, kind: str = "html") -> BeautifulSoup:
+    if not settings.html_parse_only:
+        parse_only = None
+    started = time.perf_counter()
+    soup = BeautifulSoup(page_contents, settings.html_parser, parse_only=parse_only)
+    parse_histogram.labels(endpoint_label.get(), kind).observe(time.perf_counter() - started)
+    return soup
+
+
+def parse_page(page_contents, class_names: list[str], kind: str) -> ParsedPage:
+    started = time.perf_counter()
+    soup = make_soup(page_contents, class_strainer(*class_names), kind)
+    elements = {z: [] for z in class_names}
+    for element in soup.find_all(class_=class_names):
+        for class_name in element.get("class", []):
+            if class_name in elements:
+                elements[class_name].append(element)
+    parse_seconds = time.perf_counter() - started
+    stats = parse_stats[kind]
+    stats["pages"] += 1
+    stats["seconds"] += parse_seconds
+    stats["max_seconds"] = max(stats["max_seconds"], parse_seconds)
+    return ParsedPage(soup, parse_seconds, elements)
+
+
+def parsing_stats() -> dict:
+    return {kind: {**stats, "average_seconds": stats["seconds"] / stats["pages"] if stats["pages"] > 0 else None}
+            for kind, stats in parse_stats.items()}
@@ -0,0 +1,88 @@
+import hashlib
+from dataclasses import dataclass
+
+from cachetools import LRUCache
+
+from core import settings
+from core.http_client import http_client
+from core.metrics import record_cache, stage_timer
+
+
+@dataclass
+class ValidatedContent:
+    etag: str | None
+    last_modified: str | None
+    content_hash: str
+    size: int
+    parsed: object
+
+
+class RevalidatingCache:
+    def __init__(self, max_entries: int, enabled: bool):
+        self.entries: LRUCache = LRUCache(max(1, max_entries))
+        self.enabled = enabled
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.parses = 0
+        self.parses_skipped = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    async def get(self, url: str, parse, headers: dict = None, **kwargs):
+        headers = dict(headers or {})
+        validated: ValidatedContent = self.entries.get(url) if self.enabled else None
+        if validated is not None:
+            if validated.etag is not None:
+                headers["If-None-Match"] = validated.etag
+            if validated.last_modified is not None:
+                headers["If-Modified-Since"] = validated.last_modified
+
+        response = await http_client.get(url, headers=headers, **kwargs)
+        self.requests += 1
+        if validated is not None and response.status_code == 304:
+            self.not_modified += 1
+            record_cache("revalidation", "not_modified")
+            self.parses_skipped += 1
+            self.bytes_saved += validated.size
+            return validated.parsed
+
+        content = response.content
+        self.bytes_downloaded += len(content)
+        content_hash = hashlib.sha256(content).hexdigest()
+        if validated is not None and validated.content_hash == content_hash:
+            self.unchanged += 1
+            record_cache("revalidation", "unchanged")
+            self.parses_skipped += 1
+            self.remember(url, response, validated.content_hash, validated.parsed)
+            return validated.parsed
+
+        with stage_timer("extract", url):
+            parsed = await parse(content)
+        self.parses += 1
+        record_cache("revalidation", "miss")
+        if response.status_code == 200:
+            self.remember(url, response, content_hash, parsed)
+        return parsed
+
+    def remember(self, url: str, response, content_hash: str, parsed):
+        if not self.enabled:
+            return
+        self.entries[url] = ValidatedContent(response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                                             content_hash, len(response.content), parsed)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "parses": self.parses,
+            "parses_skipped": self.parses_skipped,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+revalidating_cache = RevalidatingCache(settings.revalidation_cache_size, settings.http_revalidation)
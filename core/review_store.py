@@ -0,0 +1,80 @@
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict
+from datetime import date
+
+from core import settings
+from core.Review import Review
+
+
+class ReviewStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS reviews "
+                                     "(source TEXT NOT NULL, hash TEXT NOT NULL, review TEXT NOT NULL, "
+                                     "review_date TEXT, first_seen REAL NOT NULL, position INTEGER NOT NULL, "
+                                     "PRIMARY KEY (source, hash))")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS review_sources "
+                                     "(source TEXT PRIMARY KEY, links TEXT NOT NULL, synced_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._connection
+
+    def links(self, source: str) -> list[str]:
+        row = self.connection.execute("SELECT links FROM review_sources WHERE source = ?", (source,)).fetchone()
+        return [] if row is None else json.loads(row[0])
+
+    def set_links(self, source: str, links: list[str]):
+        self.connection.execute("INSERT OR REPLACE INTO review_sources (source, links, synced_at) VALUES (?, ?, ?)",
+                                (source, json.dumps(links), time.time()))
+
+    def known(self, source: str, reviews: list[Review]) -> set[str]:
+        hashes = [z.content_hash for z in reviews]
+        if len(hashes) == 0:
+            return set()
+        rows = self.connection.execute(f"SELECT hash FROM reviews WHERE source = ? AND hash IN "
+                                       f"({', '.join('?' * len(hashes))})", (source, *hashes)).fetchall()
+        return {z[0] for z in rows}
+
+    def add(self, source: str, reviews: list[Review]):
+        first_seen = time.time()
+        rows = []
+        for position, review in enumerate(reviews):
+            review_date = review.review_date
+            rows.append((source, review.content_hash, json.dumps(asdict(review)),
+                         None if review_date is None else review_date.isoformat(), first_seen, position))
+        self.connection.execute("BEGIN")
+        try:
+            self.connection.executemany("INSERT INTO reviews (source, hash, review, review_date, first_seen, position) "
+                                        "VALUES (?, ?, ?, ?, ?, ?) "
+                                        "ON CONFLICT (source, hash) DO UPDATE SET review = excluded.review", rows)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def reviews(self, source: str, since: date = None) -> list[Review]:
+        query = "SELECT review FROM reviews WHERE source = ?"
+        params = [source]
+        if since is not None:
+            query += " AND COALESCE(review_date, date(first_seen, 'unixepoch')) >= ?"
+            params.append(since.isoformat())
+        rows = self.connection.execute(f"{query} ORDER BY first_seen DESC, position", params).fetchall()
+        return [Review(**json.loads(z[0])) for z in rows]
+
+    def stats(self) -> dict:
+        sources, reviews = self.connection.execute(
+            "SELECT (SELECT COUNT(*) FROM review_sources), (SELECT COUNT(*) FROM reviews)").fetchone()
+        return {"path": self.path, "sources": sources, "reviews": reviews}
+
+
+review_store = ReviewStore(settings.review_store_path)
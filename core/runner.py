@@ -1,40 +1,63 @@
+import asyncio
+import collections
+import contextlib
 import urllib
 import uuid
+from datetime import date
 import random
 
-import httpx
 import pendulum
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from price_parser import Price
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
-import cachetools
-from icecream import ic
 from urllib.parse import urlparse
 
+from core import settings, tracing
+from core.admission import admission
 from core.Availability import extract_availability
-from core.Property import extract_paged_properties
+from core.browser_pool import browser_pool
+from core.correlation import CorrelationRegistry
+from core.executor import extractors
+from core.http_client import http_client
+from core.revalidation import revalidating_cache
+from core.metrics import stage_timer, record_alru
+from core.loading import LoadTarget, load_page, block_resources, wait_action
+from core.parsing import make_soup, class_strainer, parse_page
+from core.Property import extract_paged_properties, property_listing_target
 from core.Review import Review, parse_review, extract_review_page_links
+from core.review_store import review_store
 from async_lru import alru_cache
 from parse import parse
 
 from core.VacationRental import extract_vacation_rental
 from core.agents import user_agent_list
 
-response_cache = cachetools.TTLCache(maxsize=32, ttl=30)
-ic.configureOutput(prefix='|> ')
+quote_registry = CorrelationRegistry(settings.quote_registry_size)
+price_tier_counts = collections.Counter()
+background_tasks = set()
 
 header_identifier = 'X-Forwarded-Host'
-wait_action = 'networkidle'
-base_target_url = 'https://app.ownerrez.com'
+base_target_url = settings.ownerrez_app_url
+base_widget_url = f"{base_target_url}/widgets"
+booking_request_url = f'{settings.ownerrez_booking_url}/request'
+
+price_quote_target = LoadTarget(response_prefix=f'{base_widget_url}/quote')
+price_request_target = LoadTarget(selector="div.card-body table.table")
+reviews_widget_target = LoadTarget(frame_prefix=base_widget_url, selector=".reviews-pager, .review-item")
+
+pricing_classes = ["card-body", "card-img-top", "card-title", "card-subtitle"]
+reviews_strainer = class_strainer("review-item")
 
 
 async def intercept_response(current_response):
-    global response_cache
     target_request = current_response.request
     if target_request.method == "GET":
-        if target_request.url.startswith(f'{base_target_url}/widgets/quote'):
-            request_id = ic(await target_request.header_value(header_identifier))
-            response_cache[request_id] = ic(await current_response.json())
+        if target_request.url.startswith(price_quote_target.response_prefix):
+            request_id = await target_request.header_value(header_identifier)
+            try:
+                quote_registry.resolve(request_id, await current_response.json())
+                tracing.debug("quote_intercepted", request_id=request_id)
+            except Exception as error:
+                tracing.error("intercept_response", error, request_id=request_id)
             return current_response
     return current_response
 
@@ -65,24 +88,25 @@ def extract_table_detail(table_element, table_section_tag: str):
     return details
 
 
-def extract_pricing(page_content, target_url):
+def extract_pricing(page_content, target_url, include_property: bool = True):
     parsed_results = {}
-    soup = BeautifulSoup(page_content, "html.parser")
-    page_cards = soup.find_all("div", {"class": ["card-body"]})
-    parsed_results["property"] = extract_property_details({
-        "property_img": soup.find("div", {"class": ["card-img-top"]}),
-        "property_header": soup.find("h5", {"class": ["card-title"]}),
-        "property_location": soup.find("h6", {"class": ["card-subtitle"]}),
-    })
+    parsed_page = parse_page(page_content, pricing_classes, "pricing")
+    page_cards = parsed_page.select_class("card-body", "div")
+    if include_property:
+        parsed_results["property"] = extract_property_details({
+            "property_img": parsed_page.first_class("card-img-top", "div"),
+            "property_header": parsed_page.first_class("card-title", "h5"),
+            "property_location": parsed_page.first_class("card-subtitle", "h6"),
+        })
 
     for page_card in page_cards:
         inner_table = page_card.find("table", {"class": ["table"]})
         if inner_table is None:
             continue
-        body_details = ic(extract_table_detail(inner_table, "tbody"))
+        body_details = extract_table_detail(inner_table, "tbody")
         if body_details is None:
             continue
-        footer_details = ic(extract_table_detail(inner_table, "tfoot"))
+        footer_details = extract_table_detail(inner_table, "tfoot")
         if footer_details is None:
             continue
         parsed_results["details"] = body_details
@@ -125,44 +149,158 @@ def get_duration(target_url):
     query_parts = urllib.parse.parse_qs(parsed_uri.query)
     start_date = pendulum.parse(str(query_parts["arrival"].pop()), strict=False)
     end_date = pendulum.parse(str(query_parts["departure"].pop()), strict=False)
-    duration = ic(end_date.diff(start_date))
-    return duration
+    return end_date.diff(start_date)
+
+
+async def parse_availability(page_contents: bytes):
+    return await extractors.run(extract_availability, page_contents)
 
 
 async def scrape_availability_url(target_url: str):
-    headers = ic({"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]})
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(ic(target_url), headers=headers)
-            return extract_availability(response.content)
-        except Exception as error:
-            ic(error)
+    headers = {"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]}
+    try:
+        return await revalidating_cache.get(target_url, parse_availability, headers=headers)
+    except Exception as error:
+        tracing.error("scrape_availability_url", error, target_url=target_url)
     return None
 
 
-async def scrape_price_url(target_url: str):
-    global response_cache
-    request_id = ic(str(uuid.uuid4()))
-    use_interceptor = ic(not target_url.startswith("https://booking.ownerrez.com/request"))
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=True)
-        context = await browser.new_context(extra_http_headers={header_identifier: request_id})
-        page = await context.new_page()
-        if use_interceptor:
+async def fetch_price_http(target_url: str, include_property: bool = True):
+    headers = {"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]}
+    try:
+        response = await http_client.get(target_url, headers=headers, follow_redirects=True)
+        response.raise_for_status()
+        with stage_timer("extract", target_url):
+            return await extractors.run(extract_pricing, response.text, target_url, include_property)
+    except Exception as error:
+        tracing.warning("fetch_price_http", target_url=target_url, error=error.__class__.__name__)
+    return None
+
+
+async def scrape_price_url(target_url: str) -> tuple[dict, str]:
+    if settings.price_http_tier and target_url.startswith(booking_request_url):
+        parsed_pricing = await fetch_price_http(target_url)
+        if parsed_pricing is not None and "total" in parsed_pricing:
+            price_tier_counts["http"] += 1
+            return parsed_pricing, "http"
+    async with admission.browser_fallback():
+        browser_pricing = await scrape_price_browser(target_url)
+    price_tier_counts["browser"] += 1
+    return browser_pricing, "browser"
+
+
+def price_tier_stats() -> dict:
+    total = sum(price_tier_counts.values())
+    return {
+        "http": price_tier_counts["http"],
+        "browser": price_tier_counts["browser"],
+        "http_ratio": price_tier_counts["http"] / total if total > 0 else None,
+    }
+
+
+class PriceSession:
+    def __init__(self):
+        self.property = None
+        self.page = None
+        self.exit_stack = contextlib.AsyncExitStack()
+        self.page_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.page = None
+        await self.exit_stack.__aexit__(*exc_info)
+
+    async def quote(self, target_url: str) -> tuple[dict, str]:
+        include_property = self.property is None
+        if settings.price_http_tier:
+            parsed_pricing = await fetch_price_http(target_url, include_property)
+            if parsed_pricing is not None and "total" in parsed_pricing:
+                price_tier_counts["http"] += 1
+                return self.keep_property(parsed_pricing), "http"
+        async with self.page_lock:
+            if self.page is None:
+                await self.exit_stack.enter_async_context(admission.browser_fallback())
+                context = await self.exit_stack.enter_async_context(browser_pool.context())
+                await block_resources(context, target_url)
+                self.page = await context.new_page()
+            await load_page(self.page, target_url, price_request_target)
+            with stage_timer("content", target_url):
+                page_contents = await self.page.content()
+        price_tier_counts["browser"] += 1
+        with stage_timer("extract", target_url):
+            parsed_pricing = await extractors.run(extract_pricing, page_contents, target_url, include_property)
+        return self.keep_property(parsed_pricing), "browser"
+
+    def keep_property(self, parsed_pricing: dict) -> dict:
+        property_details = parsed_pricing.pop("property", None)
+        if self.property is None and property_details is not None:
+            self.property = property_details
+        return parsed_pricing
+
+
+async def scrape_price_browser(target_url: str):
+    if target_url.startswith(booking_request_url):
+        async with browser_pool.context() as context:
+            await block_resources(context, target_url)
+            page = await context.new_page()
+            await load_page(page, target_url, price_request_target)
+            with stage_timer("content", target_url):
+                page_contents = await page.content()
+        with stage_timer("extract", target_url):
+            return await extractors.run(extract_pricing, page_contents, target_url)
+
+    request_id = str(uuid.uuid4())
+    tracing.debug("quote_requested", request_id=request_id, target_url=target_url)
+    quote_registry.register(request_id)
+    try:
+        async with browser_pool.context(extra_http_headers={header_identifier: request_id}) as context:
+            await block_resources(context, target_url)
+            page = await context.new_page()
             page.on("response", intercept_response)
-        await page.goto(target_url)
-        await page.wait_for_load_state(wait_action)
-        if not use_interceptor:
-            page_contents = await page.content()
-            response_cache[request_id] = ic(extract_pricing(page_contents, target_url))
-        await browser.close()
-    return response_cache.get(ic(request_id), default=None)
+            with stage_timer("goto", target_url):
+                await page.goto(target_url, wait_until="commit")
+            with stage_timer("wait", target_url):
+                return await wait_for_quote(page, request_id, target_url)
+    finally:
+        quote_registry.discard(request_id)
+
+
+async def page_settled(page):
+    try:
+        await page.wait_for_load_state(wait_action, timeout=settings.quote_timeout * 1000)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def wait_for_quote(page, request_id: str, target_url: str):
+    quote = asyncio.ensure_future(quote_registry.wait(request_id, settings.quote_timeout))
+    settled = asyncio.ensure_future(page_settled(page))
+    try:
+        await asyncio.wait([quote, settled], return_when=asyncio.FIRST_COMPLETED)
+        if quote.done():
+            return quote.result()
+        # A page that goes idle without requesting a quote (unavailable dates, changed widget) never will
+        try:
+            return await asyncio.wait_for(asyncio.shield(quote), settings.quote_idle_grace)
+        except asyncio.TimeoutError:
+            tracing.info("quote_not_requested", request_id=request_id, target_url=target_url)
+            return None
+    finally:
+        for waiter in [quote, settled]:
+            if not waiter.done():
+                waiter.cancel()
 
 
 @alru_cache(ttl=3600)
 async def extract_reviews(iframe_content) -> list[Review]:
+    return await extractors.run(parse_reviews, iframe_content)
+
+
+def parse_reviews(iframe_content) -> list[Review]:
     parsed_results = []
-    soup = BeautifulSoup(iframe_content, "html.parser")
+    soup = make_soup(iframe_content, reviews_strainer, "reviews")
     reviews = soup.find_all("div", {"class": ["review-item"]})
     for review in reviews:
         extracted_review = parse_review(review)
@@ -174,64 +312,125 @@ async def extract_reviews(iframe_content) -> list[Review]:
 @alru_cache(ttl=3600)
 async def scrape_rental_details_url(target_url: str) -> list[dict]:
     vacation_rental_details = None
-    property_url = ic(target_url)
+    property_url = target_url
     if property_url is None or property_url == "":
         return vacation_rental_details
 
-    headers = ic({"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]})
-    async with httpx.AsyncClient() as client:
+    headers = {"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]}
+    try:
+        vacation_rental_details = await revalidating_cache.get(target_url, extract_vacation_rental, headers=headers)
+        record_alru("extract_vacation_rental", extract_vacation_rental)
+    except Exception as error:
+        tracing.error("scrape_rental_details_url", error, target_url=target_url)
+
+    return vacation_rental_details
+
+
+async def fetch_rental_details(property_element, limiter: asyncio.Semaphore):
+    async with limiter:
         try:
-            response = await client.get(ic(target_url), headers=headers)
-            vacation_rental_details = await extract_vacation_rental(response.content)
+            property_element.rental_details = await scrape_rental_details_url(property_element.property_url)
+            record_alru("scrape_rental_details_url", scrape_rental_details_url)
         except Exception as error:
-            ic(error)
+            tracing.error("fetch_rental_details", error, property_url=property_element.property_url)
 
-    return vacation_rental_details
 
+async def enrich_rental_details(properties_content: list):
+    limiter = asyncio.Semaphore(max(1, settings.rental_details_concurrency))
+    await asyncio.gather(*[fetch_rental_details(z, limiter) for z in properties_content])
 
-@alru_cache(ttl=3600)
-async def scrape_properties_url(target_url: str):
+
+def defer_rental_details(properties_content: list, enriched):
+    async def enrich():
+        await enrich_rental_details(properties_content)
+        enriched(properties_content)
+
+    enrichment = asyncio.create_task(enrich())
+    background_tasks.add(enrichment)
+    enrichment.add_done_callback(background_tasks.discard)
+
+
+async def scrape_properties_url(target_url: str, rental_details: str = "inline"):
     properties_content = []
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=True)
-        context = await browser.new_context()
+    async with browser_pool.context() as context:
+        await block_resources(context, target_url)
         page = await context.new_page()
-        await page.goto(target_url)
-        await page.wait_for_load_state(wait_action)
+        await load_page(page, target_url, property_listing_target)
         properties_content.extend(await extract_paged_properties(page, target_url))
-        await browser.close()
-    ic(f'Extracted properties count {len(properties_content)}')
-    for property_element in properties_content:
-        property_element.rental_details = await scrape_rental_details_url(property_element.property_url)
+    tracing.info("properties_extracted", target_url=target_url, count=len(properties_content))
+    if rental_details == "inline":
+        await enrich_rental_details(properties_content)
 
     return properties_content
 
 
-@alru_cache(ttl=3600)
-async def scrape_reviews_url(target_url: str):
-    reviews_content = []
-    base_widget_url = f"{base_target_url}/widgets"
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=True)
-        context = await browser.new_context()
+async def discover_review_page_links(target_url: str) -> list[str]:
+    review_links_to_visit = []
+    async with browser_pool.context() as context:
+        await block_resources(context, target_url)
         page = await context.new_page()
-        await page.goto(target_url)
-        await page.wait_for_load_state(wait_action)
-        review_links_to_visit = []
+        await load_page(page, target_url, reviews_widget_target)
         for iframe in page.frames:
             if iframe.url.startswith(base_widget_url):
-                page_content = await iframe.content()
-                review_links_to_visit = extract_review_page_links(page_content, base_target_url)
-        for review_link_to_visit in set(review_links_to_visit):
-            reviews_in_target_page = await extract_paged_reviews(page, review_link_to_visit)
-            reviews_content.extend(reviews_in_target_page)
-        await browser.close()
-        ic(f'Extracted reviews count {len(reviews_content)}')
-    return reviews_content
-
-
-@alru_cache(ttl=3600)
-async def extract_paged_reviews(page, review_link_to_visit) -> list[Review]:
-    await page.goto(ic(review_link_to_visit))
-    page_content = await page.content()
-    return await extract_reviews(page_content)
+                with stage_timer("content", target_url):
+                    page_content = await iframe.content()
+                with stage_timer("extract", target_url):
+                    review_links_to_visit = await extractors.run(extract_review_page_links, page_content,
+                                                                 base_target_url)
+    return list(dict.fromkeys(review_links_to_visit))
+
+
+async def fetch_review_page(review_link_to_visit: str, limiter: asyncio.Semaphore) -> list[Review]:
+    headers = {"User-Agent": user_agent_list[random.randint(0, len(user_agent_list) - 1)]}
+    async with limiter:
+        response = await http_client.get(review_link_to_visit, headers=headers, follow_redirects=True)
+    response.raise_for_status()
+    with stage_timer("extract", review_link_to_visit):
+        reviews_in_page = await extract_reviews(response.text)
+    record_alru("extract_reviews", extract_reviews)
+    return reviews_in_page
+
+
+async def scrape_reviews_url(target_url: str, since: date = None) -> list[Review]:
+    review_links = review_store.links(target_url)
+    if len(review_links) == 0 or not await sync_new_reviews(target_url, review_links):
+        await sync_all_reviews(target_url)
+    return review_store.reviews(target_url, since)
+
+
+async def sync_new_reviews(target_url: str, review_links: list[str]) -> bool:
+    limiter = asyncio.Semaphore(1)
+    new_reviews = []
+    for review_link in review_links:
+        try:
+            reviews_in_page = await fetch_review_page(review_link, limiter)
+        except Exception as error:
+            tracing.error("sync_new_reviews", error, review_link=review_link)
+            return False
+        known = review_store.known(target_url, reviews_in_page)
+        for index, review in enumerate(reviews_in_page):
+            if review.content_hash in known:
+                review_store.add(target_url, new_reviews + reviews_in_page[index:])
+                tracing.info("reviews_synced", target_url=target_url, count=len(new_reviews))
+                return True
+            new_reviews.append(review)
+        if len(reviews_in_page) == 0:
+            break
+    return False
+
+
+async def sync_all_reviews(target_url: str):
+    reviews_content = []
+    review_links_to_visit = await discover_review_page_links(target_url)
+    limiter = asyncio.Semaphore(max(1, settings.review_page_concurrency))
+    paged_reviews = await asyncio.gather(*[fetch_review_page(z, limiter) for z in review_links_to_visit],
+                                         return_exceptions=True)
+    for review_link_to_visit, reviews_in_target_page in zip(review_links_to_visit, paged_reviews):
+        if isinstance(reviews_in_target_page, Exception):
+            tracing.error("sync_all_reviews", reviews_in_target_page, review_link=review_link_to_visit)
+            continue
+        reviews_content.extend(reviews_in_target_page)
+    tracing.info("reviews_extracted", target_url=target_url, count=len(reviews_content))
+    review_store.add(target_url, reviews_content)
+    if len(review_links_to_visit) > 0:
+        review_store.set_links(target_url, review_links_to_visit)
@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ["1", "true", "yes", "on"]
+
+
+def default_shared_path(file_name: str) -> str:
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return os.path.join("/dev/shm", file_name)
+    return os.path.join(tempfile.gettempdir(), file_name)
+
+
+ownerrez_app_url = os.getenv('OWNERREZ_APP_URL', 'https://app.ownerrez.com').rstrip('/')
+ownerrez_booking_url = os.getenv('OWNERREZ_BOOKING_URL', 'https://booking.ownerrez.com').rstrip('/')
+
+browser_pool_size = env_int('BROWSER_POOL_SIZE', 1)
+browser_pool_max_contexts = env_int('BROWSER_POOL_MAX_CONTEXTS', 4)
+browser_pool_acquire_timeout = env_float('BROWSER_POOL_ACQUIRE_TIMEOUT', 30.0)
+
+fast_load = env_bool('FAST_LOAD')
+fast_load_timeout = env_float('FAST_LOAD_TIMEOUT', 10.0)
+fast_load_allowed_hosts = [z.strip() for z in os.getenv('FAST_LOAD_ALLOWED_HOSTS', 'ownerrez.com').split(',') if z.strip()]
+
+price_http_tier = env_bool('PRICE_HTTP_TIER', True)
+quote_timeout = env_float('QUOTE_TIMEOUT', 30.0)
+quote_idle_grace = env_float('QUOTE_IDLE_GRACE', 2.0)
+quote_registry_size = env_int('QUOTE_REGISTRY_SIZE', 256)
+
+http_max_connections = env_int('HTTP_MAX_CONNECTIONS', 100)
+http_max_keepalive = env_int('HTTP_MAX_KEEPALIVE', 20)
+http_keepalive_expiry = env_float('HTTP_KEEPALIVE_EXPIRY', 30.0)
+http_max_per_host = env_int('HTTP_MAX_PER_HOST', 10)
+http_timeout = env_float('HTTP_TIMEOUT', 20.0)
+http_connect_timeout = env_float('HTTP_CONNECT_TIMEOUT', 5.0)
+http2 = env_bool('HTTP2', True)
+http_revalidation = env_bool('HTTP_REVALIDATION', True)
+revalidation_cache_size = env_int('REVALIDATION_CACHE_SIZE', 1024)
+
+admission_control = env_bool('ADMISSION_CONTROL', True)
+admission_browser_limit = env_int('ADMISSION_BROWSER_LIMIT', 0)
+admission_http_limit = env_int('ADMISSION_HTTP_LIMIT', 0)
+admission_queue_size = env_int('ADMISSION_QUEUE_SIZE', 16)
+admission_queue_timeout = env_float('ADMISSION_QUEUE_TIMEOUT', 10.0)
+
+rental_details_concurrency = env_int('RENTAL_DETAILS_CONCURRENCY', 8)
+review_page_concurrency = env_int('REVIEW_PAGE_CONCURRENCY', 6)
+
+listing_fetch = os.getenv('LISTING_FETCH', 'browser').strip().lower()
+listing_page_concurrency = env_int('LISTING_PAGE_CONCURRENCY', 4)
+
+response_cache_enabled = env_bool('RESPONSE_CACHE', True)
+shared_cache_path = os.getenv('SHARED_CACHE_PATH', default_shared_path('headless-horseman-cache.sqlite3'))
+cache_ttl_availability = env_int('CACHE_TTL_AVAILABILITY', 60)
+cache_ttl_price = env_int('CACHE_TTL_PRICE', 60)
+cache_ttl_reviews = env_int('CACHE_TTL_REVIEWS', 3600)
+cache_ttl_properties = env_int('CACHE_TTL_PROPERTIES', 3600)
+cache_ttl_price_cell = env_int('CACHE_TTL_PRICE_CELL', 900)
+cache_stale_window = env_int('CACHE_STALE_WINDOW', 300)
+
+cache_warm_watchlist = os.getenv('CACHE_WARM_WATCHLIST', '')
+cache_warm_interval_availability = env_int('CACHE_WARM_INTERVAL_AVAILABILITY', 50)
+cache_warm_interval_price = env_int('CACHE_WARM_INTERVAL_PRICE', 50)
+cache_warm_interval_reviews = env_int('CACHE_WARM_INTERVAL_REVIEWS', 3000)
+cache_warm_concurrency = env_int('CACHE_WARM_CONCURRENCY', 2)
+cache_warm_tick = env_float('CACHE_WARM_TICK', 5.0)
+cache_warm_lock_path = os.getenv('CACHE_WARM_LOCK_PATH', default_shared_path('headless-horseman-warmer.lock'))
+
+single_flight_enabled = env_bool('SINGLE_FLIGHT', True)
+single_flight_lock_directory = os.getenv('SINGLE_FLIGHT_LOCK_DIRECTORY', default_shared_path('headless-horseman-locks'))
+single_flight_handoff_ttl = env_float('SINGLE_FLIGHT_HANDOFF_TTL', 10.0)
+single_flight_lock_timeout = env_float('SINGLE_FLIGHT_LOCK_TIMEOUT', 120.0)
+single_flight_poll_interval = env_float('SINGLE_FLIGHT_POLL_INTERVAL', 0.1)
+
+availability_horizon_days = env_int('AVAILABILITY_HORIZON_DAYS', 730)
+availability_max_horizon_days = env_int('AVAILABILITY_MAX_HORIZON_DAYS', 1095)
+
+html_parser = os.getenv('HTML_PARSER', 'html.parser')
+html_parse_only = env_bool('HTML_PARSE_ONLY', True)
+
+extractor_executor = os.getenv('EXTRACTOR_EXECUTOR', 'thread').strip().lower()
+extractor_workers = env_int('EXTRACTOR_WORKERS', 2)
+
+price_batch_max_items = env_int('PRICE_BATCH_MAX_ITEMS', 500)
+price_batch_concurrency = env_int('PRICE_BATCH_CONCURRENCY', 8)
+price_matrix_max_cells = env_int('PRICE_MATRIX_MAX_CELLS', 400)
+price_matrix_concurrency = env_int('PRICE_MATRIX_CONCURRENCY', 4)
+
+review_store_path = os.getenv('REVIEW_STORE_PATH', os.path.join(tempfile.gettempdir(), 'headless-horseman-reviews.sqlite3'))
+
+trace_level = os.getenv('TRACE_LEVEL', 'error').strip().lower()
+trace_spans = env_bool('TRACE_SPANS')
+trace_sample_rate = env_float('TRACE_SAMPLE_RATE', 1.0)
+trace_file = os.getenv('TRACE_FILE', '')
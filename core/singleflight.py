@@ -0,0 +1,97 @@
+import asyncio
+import fcntl
+import json
+import os
+import time
+
+from core import settings
+from core.store import SharedStore
+
+purge_interval = 100
+
+
+class SingleFlight:
+    def __init__(self, store: SharedStore, lock_directory: str, handoff_ttl: float, lock_timeout: float,
+                 poll_interval: float, enabled: bool):
+        self.store = store
+        self.lock_directory = lock_directory
+        self.handoff_ttl = handoff_ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self.in_flight: dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.local_joins = 0
+        self.remote_joins = 0
+
+    async def run(self, key: str, produce):
+        if not self.enabled:
+            return await produce()
+        flight = self.in_flight.get(key)
+        if flight is not None:
+            self.local_joins += 1
+        else:
+            # The flight runs detached so that cancelling the request that started it does not cancel its joiners
+            flight = asyncio.create_task(self._run_across_workers(key, produce))
+            self.in_flight[key] = flight
+            flight.add_done_callback(lambda finished: self.land(key, finished))
+        return await asyncio.shield(flight)
+
+    def land(self, key: str, flight: asyncio.Task):
+        if self.in_flight.get(key) is flight:
+            self.in_flight.pop(key)
+        if not flight.cancelled():
+            flight.exception()
+
+    async def _run_across_workers(self, key: str, produce):
+        os.makedirs(self.lock_directory, exist_ok=True)
+        lock_path = os.path.join(self.lock_directory, f'{key}.lock')
+        started = time.time()
+        waited = False
+        locked = False
+        with open(lock_path, "a") as lock_file:
+            while not locked:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    if time.time() - started > self.lock_timeout:
+                        break
+                    waited = True
+                    await asyncio.sleep(self.poll_interval)
+            try:
+                if waited:
+                    handoff = self.store.get(key)
+                    if handoff is not None and handoff.stored_at >= started:
+                        self.remote_joins += 1
+                        return json.loads(handoff.value)
+                self.leaders += 1
+                result = await produce()
+                self.store.set(key, json.dumps(result), self.handoff_ttl)
+                if self.leaders % purge_interval == 0:
+                    self.store.purge()
+                return result
+            finally:
+                if locked:
+                    try:
+                        os.unlink(lock_path)
+                    except FileNotFoundError:
+                        pass
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self.in_flight),
+            "leaders": self.leaders,
+            "local_joins": self.local_joins,
+            "remote_joins": self.remote_joins,
+        }
+
+
+single_flight = SingleFlight(SharedStore(settings.shared_cache_path, "handoffs"),
+                             settings.single_flight_lock_directory,
+                             settings.single_flight_handoff_ttl,
+                             settings.single_flight_lock_timeout,
+                             settings.single_flight_poll_interval,
+                             settings.single_flight_enabled)
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class StoredValue:
+    value: str
+    stored_at: float
+    expires_at: float
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at <= time.time()
+
+
+class SharedStore:
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                                     "(key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                                     "stored_at REAL NOT NULL, expires_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str, include_expired: bool = False) -> StoredValue | None:
+        row = self.connection.execute(f"SELECT value, stored_at, expires_at FROM {self.table} WHERE key = ?",
+                                      (key,)).fetchone()
+        if row is None:
+            return None
+        stored = StoredValue(*row)
+        if stored.expired and not include_expired:
+            return None
+        return stored
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        self.connection.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at) "
+                                "VALUES (?, ?, ?, ?)", (key, value, now, now + ttl))
+
+    def increment(self, key: str, ttl: float):
+        now = time.time()
+        self.connection.execute(f"INSERT INTO {self.table} (key, value, stored_at, expires_at) VALUES (?, '1', ?, ?) "
+                                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1, "
+                                "expires_at = excluded.expires_at", (key, now, now + ttl))
+
+    def delete(self, key: str):
+        self.connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def purge(self, older_than: float = 0) -> int:
+        cursor = self.connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?",
+                                         (time.time() - older_than,))
+        return cursor.rowcount
@@ -0,0 +1,158 @@
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+from core import settings
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+level_names = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR, "off": OFF}
+level_labels = {value: name for name, value in level_names.items()}
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    sampled: bool
+    started: float = field(default_factory=time.perf_counter)
+    fields: dict = field(default_factory=dict)
+
+
+current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+request_sampled: contextvars.ContextVar[bool | None] = contextvars.ContextVar("request_sampled", default=None)
+no_span = nullcontext()
+
+
+class Tracer:
+    def __init__(self, level: int, spans: bool, sample_rate: float, export_path: str):
+        self.level = level
+        self.spans = spans and level < OFF
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.export_path = export_path
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def enabled(self, level: int) -> bool:
+        if level < self.level:
+            return False
+        if level >= ERROR:
+            return True
+        active = current_span.get()
+        if active is not None:
+            return active.sampled
+        return request_sampled.get() is not False
+
+    def event(self, level: int, name: str, **fields):
+        if not self.enabled(level):
+            return
+        active = current_span.get()
+        self.export({
+            "type": "event",
+            "level": level_labels.get(level, level),
+            "name": name,
+            "trace_id": None if active is None else active.trace_id,
+            "span_id": None if active is None else active.span_id,
+            **fields,
+        })
+
+    def span(self, name: str, **fields):
+        if not self.spans:
+            return no_span
+        return self._span(name, fields)
+
+    @contextmanager
+    def request(self, name: str, **fields):
+        # Sampling is decided per request even with spans off so TRACE_SAMPLE_RATE still thins events
+        token = request_sampled.set(random.random() < self.sample_rate)
+        try:
+            with self.span(name, **fields) as active:
+                yield active
+        finally:
+            request_sampled.reset(token)
+
+    @contextmanager
+    def _span(self, name: str, fields: dict):
+        parent = current_span.get()
+        if parent is None:
+            sampled = request_sampled.get()
+            if sampled is None:
+                sampled = random.random() < self.sample_rate
+            active = Span(name, uuid.uuid4().hex, uuid.uuid4().hex[:16], None, sampled, fields=fields)
+        else:
+            active = Span(name, parent.trace_id, uuid.uuid4().hex[:16], parent.span_id, parent.sampled,
+                          fields=fields)
+        token = current_span.set(active)
+        status = "ok"
+        try:
+            yield active
+        except BaseException as error:
+            status = error.__class__.__name__
+            raise
+        finally:
+            current_span.reset(token)
+            if active.sampled:
+                self.export({
+                    "type": "span",
+                    "name": name,
+                    "trace_id": active.trace_id,
+                    "span_id": active.span_id,
+                    "parent_id": active.parent_id,
+                    "seconds": time.perf_counter() - active.started,
+                    "status": status,
+                    **active.fields,
+                })
+
+    def export(self, record: dict):
+        line = json.dumps({"ts": time.time(), "pid": os.getpid(), **record}, default=str) + "\n"
+        with self._lock:
+            if not self.export_path:
+                sys.stderr.write(line)
+                return
+            if self._file is None or self._pid != os.getpid():
+                self._file = open(self.export_path, "a", buffering=1)
+                self._pid = os.getpid()
+            self._file.write(line)
+
+
+tracer = Tracer(level_names.get(settings.trace_level, ERROR), settings.trace_spans, settings.trace_sample_rate,
+                settings.trace_file)
+span = tracer.span
+request = tracer.request
+
+
+def debug(name: str, **fields):
+    if tracer.level <= DEBUG:
+        tracer.event(DEBUG, name, **fields)
+
+
+def info(name: str, **fields):
+    if tracer.level <= INFO:
+        tracer.event(INFO, name, **fields)
+
+
+def warning(name: str, **fields):
+    if tracer.level <= WARNING:
+        tracer.event(WARNING, name, **fields)
+
+
+def error(name: str, exception: BaseException = None, **fields):
+    if tracer.level <= ERROR:
+        if exception is not None:
+            fields["error"] = exception.__class__.__name__
+            fields["messages"] = [str(z) for z in exception.args]
+        tracer.event(ERROR, name, **fields)
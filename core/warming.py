@@ -0,0 +1,198 @@
+import asyncio
+import fcntl
+import heapq
+import json
+import time
+from dataclasses import dataclass, field
+
+from core import settings, tracing
+from core.cache import ResponseCache
+from core.store import SharedStore
+
+
+@dataclass
+class WatchEntry:
+    kind: str
+    options: dict
+    interval: float
+    key: str = None
+    refreshed_at: float = 0.0
+    requests: int = 0
+    refreshes: int = 0
+    failures: int = 0
+    last_error: str = None
+    running: bool = field(default=False, repr=False)
+
+    def due(self, now: float) -> bool:
+        return not self.running and now - self.refreshed_at >= self.interval
+
+    def priority(self, now: float) -> float:
+        return (now - self.refreshed_at) / self.interval * (1 + self.requests)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "options": self.options,
+            "interval": self.interval,
+            "refreshed_at": self.refreshed_at or None,
+            "requests": self.requests,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+def load_watchlist(source: str) -> list[dict]:
+    source = source.strip()
+    if source == "":
+        return []
+    try:
+        if not source.startswith("["):
+            with open(source) as watchlist_file:
+                source = watchlist_file.read()
+        watchlist = json.loads(source)
+    except Exception as error:
+        tracing.error("load_watchlist", error)
+        return []
+    return [z for z in watchlist if isinstance(z, dict)]
+
+
+class CacheWarmer:
+    def __init__(self, watchlist: list[dict], intervals: dict[str, float], concurrency: int, tick: float,
+                 lock_path: str, request_counts: SharedStore):
+        self.entries = [WatchEntry(z["type"], {k: v for k, v in z.items() if k != "type"}, intervals[z["type"]])
+                        for z in watchlist if z.get("type") in intervals and intervals[z["type"]] > 0]
+        self.concurrency = max(1, concurrency)
+        self.tick = tick
+        self.lock_path = lock_path
+        self.request_counts = request_counts
+        self.lock_file = None
+        self.resolvers = {}
+        self.refresh = None
+        self.task: asyncio.Task = None
+        self.tasks: set[asyncio.Task] = set()
+        self.by_key: dict[str, WatchEntry] = {}
+
+    @property
+    def leader(self) -> bool:
+        return self.lock_file is not None
+
+    def start(self, resolvers: dict, refresh):
+        if self.task is not None or len(self.entries) == 0:
+            return
+        self.resolvers = resolvers
+        self.refresh = refresh
+        for entry in self.entries:
+            try:
+                self.resolve(entry)
+            except Exception as error:
+                tracing.error("cache_warmer_resolve", error, kind=entry.kind)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        for task in [self.task, *self.tasks]:
+            task.cancel()
+        await asyncio.gather(self.task, *self.tasks, return_exceptions=True)
+        self.task = None
+        self.tasks.clear()
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def record(self, key: str):
+        entry = self.by_key.get(key)
+        if entry is None:
+            return
+        # Every worker counts into the shared store so the leader ranks on traffic from all of them
+        try:
+            self.request_counts.increment(key, entry.interval * 2)
+        except Exception as error:
+            tracing.warning("cache_warmer_record", kind=entry.kind, error=error.__class__.__name__)
+
+    def load_requests(self):
+        for entry in self.entries:
+            stored = self.request_counts.get(entry.key) if entry.key is not None else None
+            entry.requests = 0 if stored is None else int(stored.value)
+
+    def elect(self) -> bool:
+        if self.lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def resolve(self, entry: WatchEntry) -> tuple:
+        endpoint, params, produce = self.resolvers[entry.kind](entry.options)
+        key = ResponseCache.key(endpoint, params)
+        if key != entry.key:
+            self.by_key.pop(entry.key, None)
+            entry.key = key
+            self.by_key[key] = entry
+        return endpoint, params, produce
+
+    async def run(self):
+        while True:
+            try:
+                if self.elect():
+                    self.schedule()
+            except Exception as error:
+                tracing.error("cache_warmer_schedule", error)
+            await asyncio.sleep(self.tick)
+
+    def schedule(self):
+        self.load_requests()
+        now = time.time()
+        queue = [(-entry.priority(now), index, entry) for index, entry in enumerate(self.entries) if entry.due(now)]
+        heapq.heapify(queue)
+        while len(queue) > 0 and len(self.tasks) < self.concurrency:
+            _, _, entry = heapq.heappop(queue)
+            entry.running = True
+            task = asyncio.create_task(self.refresh_entry(entry))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def refresh_entry(self, entry: WatchEntry):
+        try:
+            endpoint, params, produce = self.resolve(entry)
+            self.request_counts.delete(entry.key)
+            response = await self.refresh(endpoint, params, produce)
+            if response is None or response.get("result") is None:
+                raise ValueError(f'No result for {entry.kind} {entry.options}')
+            entry.refreshes += 1
+            entry.last_error = None
+        except Exception as error:
+            tracing.error("cache_warmer_refresh", error, kind=entry.kind)
+            entry.failures += 1
+            entry.last_error = str(error)
+        finally:
+            entry.refreshed_at = time.time()
+            entry.requests = 0
+            entry.running = False
+
+    def stats(self) -> dict:
+        try:
+            self.load_requests()
+        except Exception as error:
+            tracing.warning("cache_warmer_stats", error=error.__class__.__name__)
+        return {
+            "leader": self.leader,
+            "concurrency": self.concurrency,
+            "running": len(self.tasks),
+            "entries": [z.stats() for z in self.entries],
+        }
+
+
+cache_warmer = CacheWarmer(load_watchlist(settings.cache_warm_watchlist), {
+    "availability": settings.cache_warm_interval_availability,
+    "price": settings.cache_warm_interval_price,
+    "reviews": settings.cache_warm_interval_reviews,
+}, settings.cache_warm_concurrency, settings.cache_warm_tick, settings.cache_warm_lock_path,
+    SharedStore(settings.shared_cache_path, "warm_requests"))
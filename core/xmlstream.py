@@ -0,0 +1,66 @@
+import json
+from xml.etree.ElementTree import XMLPullParser, ParseError, Element
+
+from starlette.requests import ClientDisconnect
+
+from core import tracing
+
+chunk_size = 64 * 1024
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def element_value(element: Element):
+    children = list(element)
+    text = (element.text or "").strip()
+    if len(children) == 0 and len(element.attrib) == 0:
+        return text if text != "" else None
+
+    value = {f'@{key}': attribute for key, attribute in element.attrib.items()}
+    for child in children:
+        child_value = element_value(child)
+        child_name = local_name(child.tag)
+        if child_name not in value:
+            value[child_name] = child_value
+            continue
+        if not isinstance(value[child_name], list):
+            value[child_name] = [value[child_name]]
+        value[child_name].append(child_value)
+    if text != "":
+        value["#text"] = text
+    return value
+
+
+async def read_chunks(upload_file):
+    while chunk := await upload_file.read(chunk_size):
+        yield chunk
+
+
+async def stream_records(chunks, record_element: str):
+    parser = XMLPullParser(events=("start", "end"))
+    open_elements = []
+    open_records = 0
+    record_name = local_name(record_element)
+    try:
+        async for chunk in chunks:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                is_record = local_name(element.tag) == record_name
+                if event == "start":
+                    open_elements.append(element)
+                    open_records += is_record
+                    continue
+                open_elements.pop()
+                if is_record:
+                    open_records -= 1
+                    yield (json.dumps({record_name: element_value(element)}) + "\n").encode()
+                # Anything finished outside a record is dropped so wrappers and siblings do not pile up
+                if open_records == 0 and len(open_elements) > 0:
+                    open_elements[-1].remove(element)
+        parser.close()
+    except ParseError as error:
+        yield (json.dumps({"error": ParseError.__name__, "messages": [str(error)]}) + "\n").encode()
+    except ClientDisconnect:
+        tracing.info("stream_records_disconnected", record_element=record_element)
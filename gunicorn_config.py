@@ -1,4 +1,19 @@
+import os
+import shutil
+
 bind = "0.0.0.0:8080"
 workers = 2
 worker_class = "uvicorn.workers.UvicornWorker"
 worker_tmp_dir = "/dev/shm"
+
+metrics_directory = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/dev/shm/headless-horseman-metrics")
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_directory, ignore_errors=True)
+    os.makedirs(metrics_directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,31 @@
+import time
+
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+
+from core.metrics import endpoint_label, request_seconds, requests_in_flight
+
+
+def route_path(request: Request) -> str:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        endpoint = route_path(request)
+        endpoint_label.set(endpoint)
+        requests_in_flight.labels(endpoint).inc()
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            requests_in_flight.labels(endpoint).dec()
+            request_seconds.labels(endpoint, request.method, status_code).observe(time.perf_counter() - started)
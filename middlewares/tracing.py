@@ -0,0 +1,14 @@
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.metrics import endpoint_label
+from core.tracing import request as traced_request
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        with traced_request("request", method=request.method, endpoint=endpoint_label.get()) as active:
+            response = await call_next(request)
+            if active is not None:
+                active.fields["status"] = response.status_code
+            return response